@@ -0,0 +1,421 @@
+"""
+YsrdLinter性能基准
+按固定的随机种子生成合成项目(大量小模块、几个上万行的大模块、多层嵌套的类、大量#注释的文件、GBK编码的文件，
+以及yard-base、api-framework、前端三种项目结构)，分别计时init_folder、pylint、SingleFilechecker的构造、
+get_comments、各项自定义检查、output_csv和各个extract_*方法，结果保存为json，可以和之前的结果对比
+
+    python benchmark.py --scale small --output benchmark.json
+    python benchmark.py --scale small --output new.json --compare benchmark.json
+
+由于使用多进程，计时在 if __name__ == '__main__': 下执行
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from ysrd_linter import YsrdLinter
+from ysrd_linter.ysrd_linter import FastFilechecker, SingleFilechecker
+from ysrd_linter.pool import get_pool
+
+# 各规模的合成项目参数
+SCALES = {
+    'small': {'small_modules': 60, 'big_modules': 1, 'big_module_lines': 10000, 'nested_files': 4,
+              'nested_depth': 6, 'comment_files': 10, 'gbk_files': 6, 'api_files': 20, 'frontend_files': 30},
+    'medium': {'small_modules': 300, 'big_modules': 3, 'big_module_lines': 10000, 'nested_files': 10,
+               'nested_depth': 10, 'comment_files': 40, 'gbk_files': 20, 'api_files': 80, 'frontend_files': 150},
+    'large': {'small_modules': 1500, 'big_modules': 5, 'big_module_lines': 12000, 'nested_files': 30,
+              'nested_depth': 12, 'comment_files': 150, 'gbk_files': 60, 'api_files': 300, 'frontend_files': 600},
+}
+# 对比时耗时增加超过该比例视为变慢
+REGRESSION_THRESHOLD = 0.1
+# 耗时增加不超过该值(秒)的阶段不视为变慢，避免毫秒级的阶段因为波动误报
+REGRESSION_MIN_DELTA = 0.01
+
+WORDS = ['user', 'order', 'device', 'report', 'station', 'alarm', 'config', 'task', 'record', 'emission']
+
+
+def function_lines(rng, name, indent='', length=None, doc=None, comment=None):
+    """一个方法，length为方法体的行数，默认随机，部分方法超过80行以触发FR001"""
+    if length is None:
+        length = rng.choice([5, 12, 30, 90]) if rng.random() < 0.9 else rng.randint(81, 150)
+    if doc is None:
+        doc = rng.random() < 0.5
+    if comment is None:
+        comment = rng.random() < 0.5
+    lines = [f'{indent}def {name}(self, value=0):' if indent else f'{indent}def {name}(value=0):']
+    if doc:
+        lines.append(f'{indent}    """{name}的说明"""')
+    if comment:
+        lines.append(f'{indent}    # {name}的#注释')
+    lines.append(f'{indent}    total = value')
+    for i in range(length):
+        lines.append(f'{indent}    total += {i} * len("{rng.choice(WORDS)}")')
+    lines.append(f'{indent}    return total')
+    return lines
+
+
+def class_lines(rng, name, methods, indent=''):
+    lines = [f'{indent}class {name}(object):']
+    if rng.random() < 0.5:
+        lines.append(f'{indent}    """{name}的说明"""')
+    for i in range(methods):
+        lines.extend(function_lines(rng, f'method_{i}', indent + '    ', length=rng.choice([3, 8, 20])))
+        lines.append('')
+    return lines
+
+
+def small_module(rng, index):
+    lines = [f'"""模块{index}"""', 'import os', 'import json', '']
+    for i in range(rng.randint(2, 6)):
+        lines.extend(function_lines(rng, f'func_{index}_{i}'))
+        lines.append('')
+    if rng.random() < 0.5:
+        lines.extend(class_lines(rng, f'Model{index}', rng.choice([3, 6, 12])))
+    return '\n'.join(lines) + '\n'
+
+
+def big_module(rng, index, total_lines):
+    """上万行的大模块，方法和方法很多的类交替出现"""
+    lines = [f'"""大模块{index}"""', 'import os', '']
+    i = 0
+    while len(lines) < total_lines:
+        if i % 5 == 4:
+            lines.extend(class_lines(rng, f'Big{index}Class{i}', rng.choice([8, 15])))
+        else:
+            lines.extend(function_lines(rng, f'big_{index}_{i}'))
+        lines.append('')
+        i += 1
+    return '\n'.join(lines) + '\n'
+
+
+def nested_module(rng, index, depth):
+    """多层嵌套的类，每层都有方法"""
+    lines = [f'"""嵌套类{index}"""', '']
+    for level in range(depth):
+        indent = '    ' * level
+        lines.append(f'{indent}class Level{level}(object):')
+        for i in range(rng.randint(1, 3)):
+            lines.extend(function_lines(rng, f'method_{level}_{i}', indent + '    ', length=rng.choice([3, 15])))
+    return '\n'.join(lines) + '\n'
+
+
+def comment_module(rng, index):
+    """#注释占一半以上的文件"""
+    lines = [f'# 注释很多的模块{index}', '']
+    for i in range(rng.randint(10, 30)):
+        lines.append(f'def commented_{index}_{i}(value):')
+        for j in range(rng.randint(10, 40)):
+            lines.append(f'    # 第{j}步: 处理{rng.choice(WORDS)} # {"-" * rng.randint(10, 60)}')
+            lines.append(f'    value += {j}')
+        lines.append('    return value')
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def gbk_module(rng, index, cookie=True):
+    """
+    GBK编码的文件，cookie为False时没有编码声明，需要chardet检测编码后再交给pylint解析
+    """
+    lines = ['# -*- coding: gbk -*-'] if cookie else []
+    lines += [f'"""GBK编码的模块{index}，环境监测数据处理"""', '']
+    for i in range(rng.randint(3, 8)):
+        lines.append(f'def 处理数据_{i}(value):')
+        lines.append(f'    # 中文注释：计算{rng.choice(["排放量", "浓度", "风速", "降水量"])}')
+        for j in range(rng.choice([5, 20, 90])):
+            lines.append(f'    value += len("站点{j}")')
+        lines.append('    return value')
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def database_module(rng, index):
+    """f-string、format、%和+拼接的数据库链接，账号密码来自config模块"""
+    return '\n'.join([
+        'from ..config import USER, PASSWORD, HOST',
+        '',
+        f"DB_URL_{index} = f'mysql+pymysql://{{USER}}:{{PASSWORD}}@{{HOST}}:3306/db_{index}'",
+        f"REPORT_URL = 'postgresql+psycopg2://{{}}:{{}}@{{}}:5432/report'.format(USER, PASSWORD, HOST)",
+        f"CACHE_URL = 'mysql+pymysql://%s:%s@%s:3306/cache' % (USER, PASSWORD, HOST)",
+        f"RAW_URL = 'mysql+pymysql://' + USER + ':' + PASSWORD + '@' + HOST + ':3306/raw'",
+        '',
+    ]) + '\n'
+
+
+def write(path, text, encoding='utf-8'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding=encoding) as f:
+        f.write(text)
+
+
+def generate_python(root, rng, scale):
+    """普通python项目，子文件夹中没有__init__.py，由init_folder补齐"""
+    for i in range(scale['small_modules']):
+        write(os.path.join(root, f'pkg{i % 10}', f'sub{i % 3}', f'module_{i}.py'), small_module(rng, i))
+    for i in range(scale['big_modules']):
+        write(os.path.join(root, 'big', f'big_module_{i}.py'), big_module(rng, i, scale['big_module_lines']))
+    for i in range(scale['nested_files']):
+        write(os.path.join(root, 'nested', f'nested_{i}.py'), nested_module(rng, i, scale['nested_depth']))
+    for i in range(scale['comment_files']):
+        write(os.path.join(root, 'comments', f'commented_{i}.py'), comment_module(rng, i))
+    for i in range(scale['gbk_files']):
+        write(os.path.join(root, 'gbk', f'gbk_{i}.py'), gbk_module(rng, i, cookie=i % 2 == 0), encoding='gbk')
+    # 不应遍历的目录
+    write(os.path.join(root, 'node_modules', 'lib', 'index.js'), 'module.exports = {}\n')
+
+
+def generate_yard_base(root, rng, scale):
+    write(os.path.join(root, 'runserver.py'), 'from src import app\n')
+    write(os.path.join(root, 'bin', 'start.sh'), 'python runserver.py\n')
+    write(os.path.join(root, 'src', 'app', 'config.py'),
+          "USER = 'root'\nPASSWORD = 'secret'\nHOST = '10.0.0.1'\n")
+    for i in range(scale['api_files']):
+        lines = ['from framework.api import AbstractApi', '']
+        for j in range(rng.randint(1, 4)):
+            name = f'Get{rng.choice(WORDS).title()}List{i}{j}'
+            lines.extend([f'class {name}(AbstractApi):', f'    """{name}接口"""', '',
+                          '    def get(self):', '        return []', ''])
+        write(os.path.join(root, 'src', 'app', f'module{i % 8}', f'api_{i}.py'), '\n'.join(lines) + '\n')
+        if i % 4 == 0:
+            write(os.path.join(root, 'src', 'app', f'module{i % 8}', f'database_{i}.py'), database_module(rng, i))
+    for i in range(scale['gbk_files']):
+        write(os.path.join(root, 'src', 'app', 'gbk', f'gbk_{i}.py'), gbk_module(rng, i, cookie=False), encoding='gbk')
+
+
+def generate_api_framework(root, rng, scale):
+    write(os.path.join(root, 'runserver.py'), 'from app import create_app\n')
+    for i in range(max(1, scale['api_files'] // 4)):
+        name = f'{rng.choice(WORDS)}{i}'
+        lines = ['from flask import Blueprint', 'from flask_restful import Api', '',
+                 f"bp = Blueprint('{name}', __name__)", 'api = Api(bp)']
+        for j in range(rng.randint(2, 8)):
+            lines.append(f"api.add_resource(Resource{j}, '/{rng.choice(WORDS)}/{j}')")
+        write(os.path.join(root, 'app', name, '__init__.py'), '\n'.join(lines) + '\n')
+
+
+def generate_frontend(root, rng, scale):
+    write(os.path.join(root, 'package.json'), '{"name": "frontend"}\n')
+    for i in range(scale['frontend_files']):
+        lines = [f"import request from '@/utils/request';", '']
+        for j in range(rng.randint(3, 15)):
+            word = rng.choice(WORDS)
+            lines.append(f'export async function query{word.title()}{j}(params) {{')
+            lines.append(f"  return request('/api/{word}/list{j}', {{ params }});")
+            lines.append('}')
+            if j % 5 == 0:
+                lines.append(f'const backup{j} = "http://10.0.0.{j}/api:8080/{word}";')
+        ext = rng.choice(['.js', '.ts', '.tsx'])
+        write(os.path.join(root, 'src', 'pages', f'page{i % 12}', f'service_{i}{ext}'), '\n'.join(lines) + '\n')
+    write(os.path.join(root, 'node_modules', 'lib', 'index.js'), "fetch('/should/not/scan');\n")
+
+
+LAYOUTS = {
+    'python': generate_python,
+    'yard-base': generate_yard_base,
+    'api-framework': generate_api_framework,
+    'frontend': generate_frontend,
+}
+
+
+def generate(root, scale, seed):
+    """按seed生成所有合成项目，同样的参数每次生成的内容相同"""
+    for name, generator in LAYOUTS.items():
+        generator(os.path.join(root, name), random.Random(f'{seed}-{name}'), scale)
+
+
+def project_size(root):
+    files = 0
+    size = 0
+    for dirpath, dirs, filenames in os.walk(root):
+        for filename in filenames:
+            files += 1
+            size += os.path.getsize(os.path.join(dirpath, filename))
+    return {'files': files, 'bytes': size}
+
+
+class Timer():
+
+    def __init__(self):
+        # 阶段名 -> [每轮的耗时(秒), ...]
+        self.runs = {}
+
+    def add(self, stage, seconds):
+        self.runs.setdefault(stage, []).append(seconds)
+
+    def time(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.add(stage, time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        return {stage: {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+                for stage, runs in self.runs.items()}
+
+
+def bench_python(timer, root, jobs):
+    """普通python项目上的各个阶段"""
+    output = os.path.join(os.path.dirname(root), 'python-document.txt')
+    # 构造时不遍历目录，文件清单和init_folder分别计时
+    linter = YsrdLinter(root, output=output, jobs=jobs, read_only=True)
+    timer.time('inventory', lambda: linter.inventory)
+    timer.time('init_folder', linter.init_folder, linter.module_path)
+    linter.read_only = False
+    linter.filepaths = linter.inventory.files('.py')
+
+    # 每轮都从新启动的pylint子进程开始
+    get_pool().close()
+    timer.time('pylint', linter.check, if_print=False)
+    timer.time('pylint_cached', linter.check, if_print=False)
+    timer.time('output_csv', linter.output_csv)
+
+    checker_output = os.path.join(os.path.dirname(root), 'single-document.txt')
+    checkers = []
+    start = time.perf_counter()
+    for filepath in linter.filepaths:
+        checkers.append(SingleFilechecker(filepath, output=checker_output))
+    timer.add('single_filechecker', time.perf_counter() - start)
+    for stage in ('get_comments', 'check_func_line', 'check_class_def_number', 'check_comments'):
+        start = time.perf_counter()
+        for checker in checkers:
+            getattr(checker, stage)()
+        timer.add(stage, time.perf_counter() - start)
+    for checker in checkers:
+        checker.release_ast()
+    start = time.perf_counter()
+    for filepath in linter.filepaths:
+        FastFilechecker(filepath, output=checker_output)
+    timer.add('fast_filechecker', time.perf_counter() - start)
+    timer.time('extract_database_url', linter.extract_database_url)
+
+
+def bench_layouts(timer, root, jobs):
+    """三种项目结构上的extract_*方法"""
+    linter = YsrdLinter(os.path.join(root, 'yard-base'), jobs=jobs, read_only=True)
+    timer.time('extract_api_from_yard_base', linter.extract_api_from_yard_base)
+    timer.time('extract_database_url[yard-base]', linter.extract_database_url)
+    linter = YsrdLinter(os.path.join(root, 'api-framework'), jobs=jobs, read_only=True)
+    timer.time('extract_api_from_api_framework', linter.extract_api_from_api_framework)
+    linter = YsrdLinter(os.path.join(root, 'frontend'), jobs=jobs, read_only=True)
+    timer.time('extract_api_from_frontend', linter.extract_api_from_frontend)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args, scale, sizes):
+    from importlib import metadata as importlib_metadata
+
+    versions = {}
+    for name in ('pylint', 'astroid', 'chardet', 'pandas'):
+        try:
+            versions[name] = importlib_metadata.version(name)
+        except importlib_metadata.PackageNotFoundError:
+            versions[name] = None
+    return {
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+        'scale': args.scale,
+        'scale_params': scale,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'jobs': args.jobs,
+        'projects': sizes,
+    }
+
+
+def run(args):
+    scale = SCALES[args.scale]
+    workdir = tempfile.mkdtemp(prefix='ysrd-benchmark-')
+    timer = Timer()
+    # pandas、astroid等第一次导入的时间不计入各阶段
+    import astroid
+    import pandas
+    try:
+        template = os.path.join(workdir, 'template')
+        generate(template, scale, args.seed)
+        sizes = {name: project_size(os.path.join(template, name)) for name in LAYOUTS}
+        for i in range(args.repeat):
+            # 每轮使用新的副本，init_folder和各处按路径的缓存都从头开始
+            root = os.path.join(workdir, f'round{i}')
+            shutil.copytree(template, root)
+            bench_python(timer, os.path.join(root, 'python'), args.jobs)
+            bench_layouts(timer, root, args.jobs)
+            print(f'第{i + 1}/{args.repeat}轮完成', file=sys.stderr)
+        get_pool().close()
+    finally:
+        if args.keep:
+            print(f'合成项目保留在 {workdir}', file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {'meta': metadata(args, scale, sizes), 'stages': timer.summary()}
+
+
+def compare(result, baseline, threshold=REGRESSION_THRESHOLD, min_delta=REGRESSION_MIN_DELTA):
+    """
+    按各阶段的最小耗时对比，打印对比表
+    :return: 变慢超过threshold的阶段列表
+    """
+    regressions = []
+    print(f'{"stage":<36}{"baseline":>12}{"current":>12}{"ratio":>9}')
+    for stage, current in result['stages'].items():
+        old = baseline['stages'].get(stage)
+        if old is None:
+            print(f'{stage:<36}{"-":>12}{current["min"]:>12.4f}{"-":>9}')
+            continue
+        ratio = current['min'] / old['min'] if old['min'] > 0 else float('inf')
+        mark = ''
+        if ratio > 1 + threshold and current['min'] - old['min'] > min_delta:
+            mark = '  变慢'
+            regressions.append(stage)
+        print(f'{stage:<36}{old["min"]:>12.4f}{current["min"]:>12.4f}{ratio:>9.2f}{mark}')
+    if baseline['meta'].get('scale') != result['meta'].get('scale'):
+        print('注意: 两次结果的规模不同，对比没有意义')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='YsrdLinter性能基准')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='合成项目的规模')
+    parser.add_argument('--seed', type=int, default=0, help='生成合成项目的随机种子')
+    parser.add_argument('--repeat', type=int, default=3, help='重复的轮数，各阶段取最小耗时对比')
+    parser.add_argument('--jobs', type=int, default=None, help='pylint和extract_*的进程数，默认为cpu核数')
+    parser.add_argument('--output', default='benchmark.json', help='结果json的路径')
+    parser.add_argument('--compare', default=None, help='与之前的结果json对比')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help='视为变慢的耗时增加比例')
+    parser.add_argument('--min-delta', type=float, default=REGRESSION_MIN_DELTA,
+                        help='视为变慢的最小耗时增加(秒)')
+    parser.add_argument('--keep', action='store_true', help='保留生成的合成项目')
+    args = parser.parse_args()
+
+    result = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f'结果已保存到 {args.output}', file=sys.stderr)
+    if args.compare is None:
+        for stage, summary in result['stages'].items():
+            print(f'{stage:<36}{summary["min"]:>12.4f}')
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    return 1 if len(compare(result, baseline, args.threshold, args.min_delta)) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,10 +11,9 @@ from ysrd_linter import YsrdLinter, SingleFilechecker
 #     import os
 #     from tqdm import tqdm
 #     files = glob.glob('../test_files/*')
-#     for file in tqdm(files):
-#         linter = YsrdLinter(filepath=file,
-#                             output=f'document-{file.replace("/","-")}.txt')
-#         linter.check(if_print=False)
+#     outputs = [f'document-{file.replace("/","-")}.txt' for file in files]
+#     # 所有项目共用同一批pylint子进程，每个项目检查完后返回
+#     for linter in tqdm(YsrdLinter.check_many(files, outputs=outputs), total=len(files)):
 #         print('主进程:', os.getpid(), '当前进程的内存使用：%.4f M' % (psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024))
 #
 # # 跑单个文件
@@ -0,0 +1,98 @@
+"""
+检查结果缓存和import依赖图: 依赖的文件修改后import它的文件必须重新检查，依赖图保存在缓存的sqlite文件中
+"""
+import os
+import sqlite3
+
+import pytest
+
+from ysrd_linter import depgraph
+from ysrd_linter.depgraph import ImportGraph
+from ysrd_linter.ysrd_linter import YsrdLinter
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+@pytest.fixture
+def project(tmp_path):
+    """pkg/a.py 导入 pkg/b.py，pkg/c.py 导入 pkg/a.py，pkg/d.py 不导入项目内的文件"""
+    root = tmp_path / 'pkg'
+    root.mkdir()
+    write(root / '__init__.py', '')
+    write(root / 'a.py', '"""a"""\nfrom .b import Y\n\nprint(Y)\n')
+    write(root / 'b.py', '"""b"""\nX = 1\n')
+    write(root / 'c.py', '"""c"""\nfrom pkg import a\n\nprint(a)\n')
+    write(root / 'd.py', '"""d"""\nimport os\n\nprint(os.sep)\n')
+    return str(root)
+
+
+def paths(root, *names):
+    return [os.path.join(root, name) for name in names]
+
+
+def test_direct_imports(project):
+    graph = ImportGraph(project)
+    init, a, b, c, d = paths(project, '__init__.py', 'a.py', 'b.py', 'c.py', 'd.py')
+    assert graph.direct(a) == [b]
+    # from pkg import a 同时依赖包的__init__.py
+    assert graph.direct(c) == [init, a]
+    assert graph.direct(d) == []
+    assert graph.closure(c) == [init, a, b]
+
+
+def test_dependents(project):
+    graph = ImportGraph(project)
+    a, b, c, d = paths(project, 'a.py', 'b.py', 'c.py', 'd.py')
+    assert graph.dependents([b], [a, c, d]) == [a, c]
+    assert graph.dependents([a], [b, c, d]) == [c]
+    assert graph.dependents([d], [a, b, c]) == []
+
+
+def test_imports_table_persisted(project, tmp_path, monkeypatch):
+    db = str(tmp_path / 'cache.sqlite3')
+    a, b = paths(project, 'a.py', 'b.py')
+    conn = sqlite3.connect(db)
+    ImportGraph(project, conn).direct(a)
+    conn.commit()
+    conn.close()
+
+    # 修改时间和大小没有变化时直接读取保存的依赖，不再解析
+    def fail(*args):
+        raise AssertionError('文件没有变化时不应重新解析')
+
+    monkeypatch.setattr(depgraph, 'module_imports', fail)
+    conn = sqlite3.connect(db)
+    assert ImportGraph(project, conn).direct(a) == [b]
+    conn.close()
+
+    monkeypatch.undo()
+    write(a, '"""a"""\nimport os\n')
+    conn = sqlite3.connect(db)
+    assert ImportGraph(project, conn).direct(a) == []
+    conn.close()
+
+
+def pending_files(linter, filepaths):
+    results, pending = linter.cached_results(filepaths)
+    return sorted(os.path.basename(filepath) for filepath in pending)
+
+
+def test_dependency_change_relints_importer(project, tmp_path):
+    output = str(tmp_path / 'doc.txt')
+    filepaths = paths(project, '__init__.py', 'a.py', 'b.py', 'c.py', 'd.py')
+    YsrdLinter(project, output=output, jobs=1).check(if_print=False)
+    with open(output) as f:
+        assert "No name 'Y' in module 'pkg.b'" in f.read()
+    assert pending_files(YsrdLinter(project, output=output, jobs=1), filepaths) == []
+
+    # b.py修改后，直接和间接import它的a.py、c.py也不能使用缓存
+    write(os.path.join(project, 'b.py'), '"""b"""\nX = 1\nY = 2\n')
+    assert pending_files(YsrdLinter(project, output=output, jobs=1), filepaths) == ['a.py', 'b.py', 'c.py']
+
+    YsrdLinter(project, output=output, jobs=1).check(if_print=False)
+    with open(output) as f:
+        assert "No name 'Y'" not in f.read()
+    assert pending_files(YsrdLinter(project, output=output, jobs=1), filepaths) == []
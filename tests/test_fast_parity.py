@@ -0,0 +1,97 @@
+"""
+FastFilechecker(标准库ast和tokenize)与SingleFilechecker(astroid)的FR001、CF001、NC001检查结果必须完全一致
+"""
+import argparse
+import json.decoder
+import os
+import textwrap
+
+import pytest
+
+from ysrd_linter.ysrd_linter import FastFilechecker, SingleFilechecker
+
+
+def body(rows, indent='    '):
+    return ''.join(f'{indent}value = {i}\n' for i in range(rows))
+
+
+FIXTURES = {
+    'decorated': (
+        'import functools\n\n\n'
+        '@functools.lru_cache(maxsize=None)\n'
+        '@staticmethod\n'
+        'def cached():\n' + body(85) + '\n\n'
+        '@property\n'
+        'def prop(self):\n' + body(12) + '\n\n'
+        'class Decorated():\n'
+        '    @classmethod\n'
+        '    @functools.wraps(\n'
+        '        print,\n'
+        '    )\n'
+        '    def method(cls):\n' + body(15, '        ')
+    ),
+    'nested': (
+        'class Outer():\n'
+        '    class Inner():\n' +
+        ''.join(f'        def method_{i}(self):\n            return {i}\n\n' for i in range(12)) +
+        '    def outer_method(self):\n'
+        '        def inner():\n'
+        '            def innermost():\n' + body(14, '                ') +
+        '            return innermost\n' + body(80, '        ') +
+        '        return inner\n'
+    ),
+    'async': (
+        'import asyncio\n\n\n'
+        'async def fetch():\n' + body(90) + '    await asyncio.sleep(0)\n\n\n'
+        'class Client():\n' +
+        ''.join(f'    async def request_{i}(self):\n        await asyncio.sleep({i})\n\n' for i in range(11)) +
+        '    async def stream(self):\n'
+        '        async with self as session:\n'
+        '            async for item in session:\n' + body(12, '                ')
+    ),
+    'commented': (
+        'def commented_first_line():\n'
+        '    # 第一行就是注释\n' + body(12) + '\n\n'
+        'def comment_at_end():\n' + body(12) + '    # 最后一行的注释\n\n\n'
+        'def comment_after_end():\n' + body(12) + '# 方法结束之后的注释不算\n\n\n'
+        'def commented_in_string():\n'
+        '    text = "# 字符串中的#不是注释"\n' + body(12) + '\n\n'
+        'class CommentedClass():  # 类定义行上的注释\n' + body(12)
+    ),
+    'docstring': (
+        '"""模块的文档字符串"""\n\n\n'
+        'def documented():\n'
+        '    """方法的文档字符串"""\n' + body(12) + '\n\n'
+        'def single_quoted():\n'
+        "    'single quoted docstring'\n" + body(12) + '\n\n'
+        'def not_a_docstring():\n'
+        '    value = "赋值不是文档字符串"\n' + body(12) + '\n\n'
+        'class Documented():\n'
+        '    """类的文档字符串"""\n' +
+        ''.join(f'    def method_{i}(self):\n        """method {i}"""\n        return {i}\n\n' for i in range(11)) +
+        'class Undocumented():\n' + body(12) +
+        '    def long_method(self):\n'
+        '        r"""raw docstring"""\n' + body(85, '        ')
+    ),
+}
+
+
+def findings(checker_class, filepath):
+    checker = checker_class(filepath, output=os.devnull)
+    checker.check(if_pylint=False, if_print=False, if_write=False)
+    return checker.findings
+
+
+@pytest.mark.parametrize('name', sorted(FIXTURES))
+def test_fixture_parity(name, tmp_path):
+    filepath = tmp_path / f'{name}.py'
+    filepath.write_text(textwrap.dedent(FIXTURES[name]), encoding='utf-8')
+    expected = findings(SingleFilechecker, str(filepath))
+    assert len(expected) > 0
+    assert findings(FastFilechecker, str(filepath)) == expected
+
+
+@pytest.mark.parametrize('filepath', [argparse.__file__, json.decoder.__file__, textwrap.__file__,
+                                      SingleFilechecker.__init__.__code__.co_filename])
+def test_real_file_parity(filepath):
+    assert findings(FastFilechecker, filepath) == findings(SingleFilechecker, filepath)
@@ -0,0 +1,36 @@
+"""
+import ysrd_linter 不导入pandas、pylint、astroid、psutil、chardet，导入时间不超过IMPORT_BUDGET
+在新的解释器中测量，不受当前进程中已经导入的模块影响
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 导入ysrd_linter的时间上限(秒)，目前约50ms
+IMPORT_BUDGET = 0.2
+HEAVY_MODULES = ('pandas', 'pylint', 'astroid', 'psutil', 'chardet')
+
+SCRIPT = f'''
+import json, sys, time
+start = time.perf_counter()
+import ysrd_linter
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'loaded': [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))
+'''
+
+
+def measure_import():
+    output = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def test_heavy_modules_not_imported():
+    assert measure_import()['loaded'] == []
+
+
+def test_import_time_budget():
+    # 取三次中最快的一次，避免偶尔的磁盘缓存、调度抖动
+    elapsed = min(measure_import()['elapsed'] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET, f'import ysrd_linter 用时 {elapsed * 1000:.0f}ms，超过 {IMPORT_BUDGET * 1000:.0f}ms'
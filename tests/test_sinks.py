@@ -0,0 +1,59 @@
+"""
+日志的解析和统计csv: 提示信息中包含':'时也要解析出正确的代码和错误类型，统计csv中的代码与错误类型一一对应
+"""
+import csv
+
+from ysrd_linter.sinks import Finding, StatsSink, format_pylint, format_ysrd, parse_finding
+
+FINDINGS = [
+    Finding('src/app/a.py', 3, 0, 'W0611', 'unused-import', 'Unused import os.path'),
+    Finding('src/app/a.py', 7, 4, 'W0105', 'pointless-string-statement', "String statement has no effect: 'key: value'"),
+    Finding('src/app/a.py', 9, 0, 'C0301', 'line-too-long', 'Line too long (130/120)'),
+    Finding('src/app/a.py', 12, 8, 'W1309', 'f-string-without-interpolation',
+            "Using an f-string that does not have any interpolated variables: f'http://host:8080/api'"),
+]
+YSRD_FINDINGS = [
+    Finding('src/app/a.py', 20, None, 'FR001', 'function-too-long', '[handle] 函数行数: 120, 超过80行'),
+    Finding('src/app/b.py', 1, None, 'CF001', 'class-too-many', '[b.py] 类的数量: 6'),
+]
+
+
+def test_parse_pylint_line_with_colons():
+    for finding in FINDINGS:
+        assert parse_finding(format_pylint(finding) + '\n') == finding
+
+
+def test_parse_ysrd_line_with_colons():
+    for finding in YSRD_FINDINGS:
+        assert parse_finding(format_ysrd(finding)) == finding
+
+
+def test_parse_other_lines():
+    for line in ['************* Module src.app.a', '', 'Your code has been rated at 9.50/10', 'ysrdlinter',
+                 '-' * 40]:
+        assert parse_finding(line) is None
+
+
+def test_stats_sink_counts_codes(tmp_path):
+    path = tmp_path / 'stats.csv'
+    sink = StatsSink(str(path))
+    log = [format_pylint(finding) for finding in FINDINGS + FINDINGS[1:2]]
+    log += [format_ysrd(finding) for finding in YSRD_FINDINGS]
+    log += ['************* Module src.app.a', 'Your code has been rated at 9.50/10']
+    for line in log:
+        finding = parse_finding(line)
+        if finding is not None:
+            sink.add(finding)
+    sink.close()
+    with open(path, encoding='gb18030', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['错误类型', '次数', '代码']
+    # 次数多的在前，次数相同时按出现的先后顺序，错误类型与代码在同一行
+    assert rows[1:] == [
+        ['pointless-string-statement', '2', 'W0105'],
+        ['unused-import', '1', 'W0611'],
+        ['line-too-long', '1', 'C0301'],
+        ['f-string-without-interpolation', '1', 'W1309'],
+        ['function-too-long', '1', 'FR001'],
+        ['class-too-many', '1', 'CF001'],
+    ]
@@ -0,0 +1,89 @@
+"""
+YsrdLinter检查结果的持久化缓存
+以 文件路径+模块名+文件内容+import的项目内文件的内容+rcfile+版本号 的哈希为key，保存每个文件的pylint和自定义检查结果，
+自身和依赖的文件都没有变化的文件直接从缓存中读取结果，不再重新检查
+"""
+import hashlib
+import json
+import sqlite3
+import time
+
+from .depgraph import file_digest, module_name
+
+# 缓存文件的大小上限(字节)，超过后按最近使用时间淘汰
+CACHE_MAX_SIZE = 100 * 1024 * 1024
+# 缓存中结果的格式版本，格式变化后旧的缓存自动失效
+CACHE_FORMAT = 4
+
+
+class ResultCache():
+
+    def __init__(self, path, salt='', max_size=CACHE_MAX_SIZE):
+        """
+        :param path: sqlite缓存文件路径
+        :param salt: rcfile、版本号等影响检查结果的信息，变化后所有缓存失效
+        :param max_size: 缓存大小上限(字节)
+        """
+        self.path = path
+        self.salt = salt
+        self.max_size = max_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+
+    def key(self, filepath, dependencies=()):
+        """
+        同一内容的文件路径不同时输出的日志也不同，因此路径也是key的一部分；
+        模块名由上层文件夹的__init__.py决定，影响日志中的Module、相对导入的推断和cyclic-import，也是key的一部分
+        :param dependencies: [(依赖文件路径, 内容的sha256), ...]，见depgraph.ImportGraph.dependencies
+        """
+        sha = hashlib.sha256(f'{CACHE_FORMAT}:{self.salt}'.encode())
+        sha.update(b'\0' + filepath.encode() + b'\0' + module_name(filepath).encode() + b'\0')
+        sha.update(file_digest(filepath).encode())
+        for path, digest in sorted(dependencies):
+            sha.update(b'\0' + path.encode() + b'\0' + digest.encode())
+        return sha.hexdigest()
+
+    def get(self, key):
+        row = self.conn.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key, result):
+        data = json.dumps(result, ensure_ascii=False)
+        self.conn.execute('INSERT OR REPLACE INTO results (key, result, size, last_used) VALUES (?, ?, ?, ?)',
+                          (key, data, len(data.encode()), time.time()))
+
+    def evict(self):
+        """缓存总大小超过max_size时，从最久没有使用的记录开始删除"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_size:
+            return
+        rows = self.conn.execute('SELECT key, size FROM results ORDER BY last_used').fetchall()
+        keys = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            keys.append((key,))
+            total -= size
+        self.conn.executemany('DELETE FROM results WHERE key = ?', keys)
+
+    def close(self):
+        self.evict()
+        self.conn.commit()
+        self.conn.close()
+
+
+def cache_salt(*paths, versions=()):
+    """根据rcfile等文件内容和各依赖的版本号生成salt"""
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    for version in versions:
+        sha.update(str(version).encode() + b'\0')
+    return sha.hexdigest()
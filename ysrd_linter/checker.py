@@ -0,0 +1,167 @@
+"""
+YsrdLinter自定义检查(FR001、CF001、NC001)的pylint插件
+通过 --load-plugins=ysrd_linter.checker 加载后与pylint的其他检查在同一次运行中完成，
+astroid解析、缓存和推断每个文件只做一次
+"""
+import functools
+import os
+
+from pylint.checkers import BaseChecker
+from pylint.constants import WarningScope
+from pylint.interfaces import IAstroidChecker, ITokenChecker
+from pylint.reporters import BaseReporter
+
+from .encoding import undeclared_encoding
+from .profiling import Measure
+from .sinks import Finding
+from .ysrd_linter import SingleFilechecker, YSRD_MESSAGES
+
+# pylint要求消息id为 类型字母+4位数字，YsrdLinter的代码在日志中仍按原来的格式输出
+YSRD_MSGIDS = {
+    'FR001': 'C9001',
+    'CF001': 'C9002',
+    'NC001': 'C9003',
+}
+YSRD_CODES = {msgid: code for code, msgid in YSRD_MSGIDS.items()}
+
+
+class PluginFilechecker(SingleFilechecker):
+    """使用pylint已经解析好的语法树和tokens，检查结果交给pylint输出"""
+
+    def __init__(self, checker, node, tokens=None):
+        self.checker = checker
+        super().__init__(node.file, ast_node=node, tokens=tokens)
+
+    def report(self, code, item, *args):
+        # 节点范围的消息，行号取节点的fromlineno，与原来的日志一致
+        self.checker.add_message(YSRD_MSGIDS[code], node=item.node, args=(item.qualname,) + args)
+
+
+class YsrdChecker(BaseChecker):
+    __implements__ = (IAstroidChecker, ITokenChecker)
+
+    name = 'ysrd'
+    msgs = {
+        YSRD_MSGIDS[code]: ('[%s] ' + msg, symbol.replace(' ', '-'), f'YsrdLinter {code}: {symbol}',
+                            {'scope': WarningScope.NODE})
+        for code, (msg, symbol) in YSRD_MESSAGES.items()
+    }
+    options = (
+        ('max-function-rows', {
+            'default': 80, 'type': 'int', 'metavar': '<int>',
+            'help': 'FR001: 方法的最大行数',
+        }),
+        ('max-class-functions', {
+            'default': 10, 'type': 'int', 'metavar': '<int>',
+            'help': 'CF001: 类中方法的最大个数',
+        }),
+        ('min-comment-rows', {
+            'default': 10, 'type': 'int', 'metavar': '<int>',
+            'help': 'NC001: 超过该行数的方法或类必须有注释',
+        }),
+    )
+
+    def __init__(self, linter=None):
+        super().__init__(linter)
+        self.tokens = None
+
+    def process_tokens(self, tokens):
+        # pylint先tokenize再遍历语法树，这里保存tokens给visit_module获取#注释，避免重新读文件
+        self.tokens = tokens
+
+    def visit_module(self, node):
+        tokens, self.tokens = self.tokens, None
+        if node.file is None or not os.path.exists(node.file):
+            return
+        measure = Measure() if getattr(self.linter.reporter, 'profile', None) is not None else None
+        filechecker = PluginFilechecker(self, node, tokens)
+        filechecker.check_func_line(self.config.max_function_rows)
+        filechecker.check_class_def_number(self.config.max_class_functions)
+        filechecker.check_comments(self.config.min_comment_rows)
+        if measure is not None:
+            self.linter.reporter.profile.append(measure.stop('ysrd_checks', os.path.abspath(node.file)))
+
+
+class YsrdReporter(BaseReporter):
+    """
+    按文件把pylint的输出收集为Finding记录，YsrdLinter自定义检查的结果使用原来的代码和错误类型
+    """
+    name = 'ysrd'
+
+    def __init__(self, output=None, profile=False):
+        """
+        :param profile: 为True时按文件记录耗时和内存，包括astroid解析在内的整个文件为lint_file阶段，
+                        其中自定义检查的部分另外记为ysrd_checks阶段
+        """
+        super().__init__(output)
+        # {文件绝对路径: {'module': 模块名, 'pylint': [Finding, ...], 'ysrd': [Finding, ...]}}
+        self.results = {}
+        # {文件绝对路径: pylint对该文件的统计信息}
+        self.stats = {}
+        # {文件绝对路径: 丢弃的cyclic-import条数}，分片只看到部分模块，循环导入由主进程汇总所有文件的import后检查
+        self.dropped = {}
+        # 正在检查的 (模块名, 文件绝对路径)
+        self.current = None
+        # [StageRecord, ...]，profile为False时为None
+        self.profile = [] if profile else None
+        self.measure = None
+
+    def on_set_current_module(self, module, filepath):
+        self.collect_stats()
+        if filepath is None:
+            return
+        filepath = os.path.abspath(filepath)
+        self.current = (module, filepath)
+        if self.profile is not None:
+            self.measure = Measure()
+        self.results.setdefault(filepath, {'module': module, 'pylint': [], 'ysrd': []})
+
+    def collect_stats(self):
+        """
+        pylint按模块名记录统计信息，切换到下一个模块时才重置，在这之前按文件保存下来，
+        只读模式下没有__init__.py，不同文件夹下的同名文件模块名相同，按模块名取会互相覆盖
+        """
+        if self.current is not None:
+            module, filepath = self.current
+            self.stats[filepath] = dict(self.linter.stats.by_module.get(module, {}))
+            self.current = None
+            if self.measure is not None:
+                self.profile.append(self.measure.stop('lint_file', filepath))
+                self.measure = None
+
+    def handle_message(self, msg):
+        if msg.symbol == 'cyclic-import':
+            filepath = os.path.abspath(msg.abspath)
+            self.dropped[filepath] = self.dropped.get(filepath, 0) + 1
+            return
+        result = self.results.setdefault(os.path.abspath(msg.abspath),
+                                         {'module': msg.module, 'pylint': [], 'ysrd': []})
+        if msg.msg_id in YSRD_CODES:
+            result['ysrd'].append(Finding(msg.path, msg.line, msg.column, YSRD_CODES[msg.msg_id],
+                                          msg.symbol.replace('-', ' '), msg.msg))
+        else:
+            result['pylint'].append(Finding(msg.path, msg.line, msg.column, msg.msg_id, msg.symbol, msg.msg))
+
+    def display_reports(self, layout):
+        pass
+
+    def _display(self, layout):
+        pass
+
+
+def get_ast(pylint_get_ast, filepath, modname, data=None):
+    """
+    pylint按utf-8读取没有编码声明的文件，GBK等文件先按检测出的编码读出内容再交给pylint解析，
+    语法错误等仍由pylint按原来的方式报告
+    """
+    if data is None:
+        encoding = undeclared_encoding(filepath)
+        if encoding is not None:
+            with open(filepath, 'r', encoding=encoding) as f:
+                data = f.read()
+    return pylint_get_ast(filepath, modname, data)
+
+
+def register(linter):
+    linter.register_checker(YsrdChecker(linter))
+    linter.get_ast = functools.partial(get_ast, linter.get_ast)
@@ -0,0 +1,266 @@
+"""
+常驻的YsrdLinter进程
+每次运行YsrdLinter都要启动子进程、导入pylint并重新解析所有文件。常驻进程启动时检查一次整个项目，
+之后定时比较py文件的修改时间和大小(stat轮询)，只重新检查修改过的文件和直接或间接import了它们的文件。pylint子进程常驻，
+astroid中没有修改的模块保持解析好的状态；自定义检查的结果按文件缓存，fast请求只用FastFilechecker重新检查，
+不经过pylint，可以在几十毫秒内返回。
+只重新检查部分文件时看不到整个项目的import，常驻进程的结果中没有cyclic-import(R0401)，需要时用YsrdLinter.check检查整个项目。
+
+编辑器和pre-commit通过Unix socket发送一行json请求，收到一行json响应，socket只有启动常驻进程的用户可以读写，
+请求中项目文件夹之外的文件不检查，返回错误:
+    {"command": "check", "files": ["a.py"]}                 pylint和自定义检查的结果，修改过的文件先重新检查
+    {"command": "check", "files": ["a.py"], "fast": true}   只返回自定义检查的结果，可以带"source"传入未保存的内容
+    {"command": "status"} / {"command": "shutdown"}
+
+    python -m ysrd_linter.daemon serve /path/to/project --socket /tmp/ysrd.sock
+    python -m ysrd_linter.daemon check --socket /tmp/ysrd.sock a.py b.py
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from .inventory import ProjectInventory
+from .pool import get_pool
+from .ysrd_linter import FastFilechecker, YsrdLinter
+
+# 默认的socket文件名，放在项目文件夹下
+SOCKET_NAME = '.ysrd-linter.sock'
+# stat轮询的间隔(秒)
+POLL_INTERVAL = 1.0
+
+
+def stat_key(filepath):
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def linter_path(filepath):
+    """与YsrdLinter一致，当前目录下的文件用相对路径，日志和Finding中的文件名相同"""
+    return os.path.abspath(filepath).replace(os.getcwd() + '/', '')
+
+
+def serialize(result):
+    return {
+        'module': result.get('module'),
+        'pylint': [finding._asdict() for finding in result.get('pylint', [])],
+        'ysrd': [finding._asdict() for finding in result.get('ysrd', [])],
+    }
+
+
+class LintDaemon():
+
+    def __init__(self, path, socket_path=None, interval=POLL_INTERVAL, **kwargs):
+        """
+        :param path: 项目文件夹或py文件
+        :param socket_path: Unix socket路径，默认为项目文件夹下的.ysrd-linter.sock
+        :param interval: stat轮询的间隔(秒)
+        :param kwargs: 传给YsrdLinter的其他参数，如jobs、read_only、no_cache
+        """
+        self.linter = YsrdLinter(path, **kwargs)
+        self.socket_path = socket_path or os.path.join(self.linter.root, SOCKET_NAME)
+        self.interval = interval
+        # 轮询线程和请求处理共用pylint进程池和下面的状态
+        self.lock = threading.RLock()
+        # 文件路径 -> (mtime_ns, 文件大小)，上一次检查时的状态
+        self.stats = {}
+        # 文件绝对路径 -> {'module': 模块名, 'pylint': [Finding, ...], 'ysrd': [Finding, ...], 'stats': {...}}
+        self.results = {}
+        # 文件绝对路径 -> ((mtime_ns, 文件大小), [Finding, ...])，FastFilechecker的结果
+        self.fast_results = {}
+        self.stopped = threading.Event()
+        self.server = None
+
+    def scan(self):
+        """项目中所有py文件当前的状态"""
+        if hasattr(self.linter, 'module_path'):
+            filepaths = ProjectInventory(self.linter.module_path).files('.py')
+        else:
+            filepaths = [self.linter.filepath]
+        stats = {}
+        for filepath in filepaths:
+            try:
+                stats[filepath] = stat_key(filepath)
+            except OSError:
+                continue
+        return stats
+
+    def in_project(self, filepath):
+        """文件(解析符号链接后)是否在项目文件夹中，检查单个文件时只有这个文件"""
+        if hasattr(self.linter, 'module_path'):
+            root = os.path.realpath(self.linter.root)
+            return os.path.commonpath([root, os.path.realpath(filepath)]) == root
+        return os.path.realpath(filepath) == os.path.realpath(self.linter.filepath)
+
+    def refresh(self, filepaths=None):
+        """
+        重新检查修改过和新增的文件，以及import了它们的文件
+        :param filepaths: 只比较这些文件，为None时轮询整个项目，并移除已经删除的文件
+        :return: 重新检查的文件列表
+        """
+        with self.lock:
+            if filepaths is None:
+                current = self.scan()
+                for filepath in set(self.stats) - set(current):
+                    del self.stats[filepath]
+                    self.results.pop(os.path.abspath(filepath), None)
+                    self.fast_results.pop(os.path.abspath(filepath), None)
+            else:
+                current = {filepath: stat_key(filepath) for filepath in filepaths
+                           if os.path.isfile(filepath) and self.in_project(filepath)}
+            changed = [filepath for filepath, key in current.items() if self.stats.get(filepath) != key]
+            if len(changed) == 0:
+                return changed
+            if hasattr(self.linter, 'module_path') and not self.linter.read_only:
+                self.linter.init_folder(self.linter.module_path, changed)
+            others = [filepath for filepath in self.stats if filepath not in current]
+            targets = changed + self.linter.dependents(changed, others + [
+                filepath for filepath in current if filepath not in changed])
+            results = self.linter.check_with_cache(targets)
+            for filepath in targets:
+                self.results[os.path.abspath(filepath)] = results.get(os.path.abspath(filepath), {})
+            for filepath in changed:
+                self.stats[filepath] = current[filepath]
+            return targets
+
+    def fast_findings(self, filepath, source=None):
+        """只做自定义检查，source为编辑器中未保存的内容，不缓存"""
+        key = None
+        if source is None:
+            key = stat_key(filepath)
+            cached = self.fast_results.get(os.path.abspath(filepath))
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        checker = FastFilechecker(filepath, output=os.devnull, source=source)
+        checker.check(if_print=False, if_write=False)
+        if key is not None:
+            self.fast_results[os.path.abspath(filepath)] = (key, checker.findings)
+        return checker.findings
+
+    def handle(self, request):
+        """处理一个请求，返回响应的dict"""
+        command = request.get('command', 'check')
+        if command == 'check':
+            files = [linter_path(filepath) for filepath in request.get('files') or []]
+            outside = [filepath for filepath in files if not self.in_project(filepath)]
+            if len(outside) > 0:
+                # 不在项目文件夹之外新建__init__.py、读取其他文件
+                return {'ok': False, 'error': f'文件不在项目{self.linter.root}中: {", ".join(outside)}'}
+            if request.get('fast'):
+                source = request.get('source')
+                if source is not None and len(files) != 1:
+                    return {'ok': False, 'error': 'source只能和一个文件一起传入'}
+                with self.lock:
+                    return {'ok': True, 'results': {
+                        filepath: {'ysrd': [finding._asdict() for finding in self.fast_findings(filepath, source)]}
+                        for filepath in files}}
+            self.refresh(files or None)
+            with self.lock:
+                if len(files) == 0:
+                    files = list(self.stats)
+                return {'ok': True, 'results': {
+                    filepath: serialize(self.results.get(os.path.abspath(filepath), {})) for filepath in files}}
+        if command == 'status':
+            with self.lock:
+                return {'ok': True, 'pid': os.getpid(), 'root': self.linter.root, 'files': len(self.stats)}
+        if command == 'shutdown':
+            self.stop()
+            return {'ok': True}
+        return {'ok': False, 'error': f'未知的命令 {command}'}
+
+    def watch(self):
+        """轮询线程"""
+        while not self.stopped.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f'重新检查失败: {e}', file=sys.stderr)
+
+    def serve(self):
+        """检查整个项目后开始轮询并处理socket请求，直到收到shutdown"""
+        self.refresh()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = daemon.handle(json.loads(line))
+                    except Exception as e:
+                        response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+                    self.wfile.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+                    self.wfile.flush()
+
+        # 任何本地进程都可以连接socket，创建时只给当前用户读写权限
+        umask = os.umask(0o177)
+        try:
+            self.server = socketserver.UnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(umask)
+        watcher = threading.Thread(target=self.watch, daemon=True)
+        watcher.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stopped.set()
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            get_pool().close()
+
+    def stop(self):
+        self.stopped.set()
+        if self.server is not None:
+            # serve_forever所在的线程正在处理当前请求，在另一个线程中等待它退出
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+def request(socket_path, payload, timeout=None):
+    """向常驻进程发送一个请求，返回响应的dict"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps(payload, ensure_ascii=False).encode() + b'\n')
+        with client.makefile('rb') as f:
+            return json.loads(f.readline())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='常驻的YsrdLinter进程')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='启动常驻进程')
+    serve.add_argument('path', help='项目文件夹或py文件')
+    serve.add_argument('--socket', default=None, help=f'Unix socket路径，默认为项目文件夹下的{SOCKET_NAME}')
+    serve.add_argument('--interval', type=float, default=POLL_INTERVAL, help='stat轮询的间隔(秒)')
+    serve.add_argument('--jobs', type=int, default=None, help='pylint子进程数')
+    serve.add_argument('--read-only', action='store_true', help='不新建__init__.py')
+    check = commands.add_parser('check', help='向常驻进程请求检查结果，有问题时返回码为1')
+    check.add_argument('files', nargs='*', help='py文件，为空时返回整个项目的结果')
+    check.add_argument('--socket', required=True, help='Unix socket路径')
+    check.add_argument('--fast', action='store_true', help='只做自定义检查')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        LintDaemon(args.path, args.socket, args.interval, jobs=args.jobs, read_only=args.read_only).serve()
+        return 0
+    response = request(args.socket, {'command': 'check', 'fast': args.fast,
+                                     'files': [os.path.abspath(filepath) for filepath in args.files]})
+    if not response['ok']:
+        print(response['error'], file=sys.stderr)
+        return 2
+    count = 0
+    for filepath, result in response['results'].items():
+        for finding in result.get('pylint', []) + result.get('ysrd', []):
+            print(f'{finding["file"]}:{finding["line"]}: {finding["code"]}: {finding["message"]}')
+            count += 1
+    return 1 if count > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
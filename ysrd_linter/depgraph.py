@@ -0,0 +1,182 @@
+"""
+项目内的import依赖图
+pylint推断时会用到import的模块，文件A的检查结果可能因为文件B的修改而变化，只按文件自身内容缓存结果是不安全的。
+这里从Import、ImportFrom节点找出每个文件直接import的项目内文件，保存在检查结果缓存的sqlite文件中，
+文件的修改时间和大小不变时不再重新解析；缓存的key包含所有直接和间接依赖文件的内容，
+一个文件修改后，只有它和直接或间接import它的文件需要重新检查
+"""
+import ast
+import collections
+import hashlib
+import json
+import os
+
+from .encoding import detect_bytes
+
+
+def file_digest(filepath):
+    """文件内容的sha256"""
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def module_name(filepath):
+    """
+    pylint给文件的模块名: 从文件所在的文件夹向上，包含__init__.py的文件夹都是包名的一部分，
+    同一个文件在read_only(不新建__init__.py)和普通检查时模块名和相对导入的解析结果不同
+    """
+    dirname, filename = os.path.split(os.path.abspath(filepath))
+    parts = [] if filename == '__init__.py' else [os.path.splitext(filename)[0]]
+    while os.path.isfile(os.path.join(dirname, '__init__.py')):
+        dirname, name = os.path.split(dirname)
+        parts.insert(0, name)
+        if not name:
+            break
+    return '.'.join(parts)
+
+
+def find_module_file(modname, level, filepath, root=None):
+    """
+    按 from/import 语句找到被导入模块的文件
+    :param level: 相对导入的层级，from .config import X 为1，绝对导入为0或None
+    :param root: 项目文件夹，绝对导入在导入文件所在的文件夹及其上层直到root的各个文件夹中查找
+    """
+    dirname = os.path.dirname(os.path.abspath(filepath))
+    if level:
+        for _ in range(level - 1):
+            dirname = os.path.dirname(dirname)
+        dirnames = [dirname]
+    else:
+        dirnames = [dirname]
+        while root is not None and dirname != root and dirname.startswith(root):
+            dirname = os.path.dirname(dirname)
+            dirnames.append(dirname)
+    parts = modname.split('.') if modname else []
+    for dirname in dirnames:
+        path = os.path.join(dirname, *parts)
+        for candidate in (path + '.py', os.path.join(path, '__init__.py')):
+            if os.path.isfile(candidate):
+                return candidate
+    return None
+
+
+def module_imports(filepath, root=None):
+    """
+    文件中所有import语句(包括方法中的)导入的项目内文件，import a.b.c 同时依赖a、a.b和a.b.c，
+    from pkg import name 依赖pkg，name为子模块时也依赖该子模块
+    :return: [文件绝对路径, ...]，无法解析的文件为[]
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    try:
+        tree = ast.parse(data.decode(detect_bytes(data) or 'utf-8', errors='replace'), filepath)
+    except (SyntaxError, ValueError):
+        return []
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                parts = alias.name.split('.')
+                modules.extend(('.'.join(parts[:i + 1]), 0) for i in range(len(parts)))
+        elif isinstance(node, ast.ImportFrom):
+            modules.append((node.module, node.level))
+            for alias in node.names:
+                if alias.name != '*':
+                    modules.append(('.'.join(filter(None, [node.module, alias.name])), node.level))
+    filepath = os.path.abspath(filepath)
+    files = []
+    for modname, level in dict.fromkeys(modules):
+        module_file = find_module_file(modname, level, filepath, root)
+        if module_file is not None:
+            module_file = os.path.abspath(module_file)
+            if module_file != filepath and module_file not in files:
+                files.append(module_file)
+    return files
+
+
+class ImportGraph():
+
+    def __init__(self, root, conn=None):
+        """
+        :param root: 项目文件夹，项目本身是一个包时(有__init__.py)绝对导入也在它的上一层中查找
+        :param conn: 检查结果缓存的sqlite连接，各文件的直接依赖保存在imports表中，为None时只在内存中
+        """
+        root = os.path.abspath(root)
+        self.root = os.path.dirname(root) if os.path.isfile(os.path.join(root, '__init__.py')) else root
+        self.conn = conn
+        if conn is not None:
+            conn.execute('CREATE TABLE IF NOT EXISTS imports ('
+                         'file TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, deps TEXT NOT NULL)')
+        # 文件绝对路径 -> [直接依赖的文件绝对路径, ...]
+        self.deps = {}
+        # 文件绝对路径 -> 内容的sha256
+        self.digests = {}
+
+    def direct(self, filepath):
+        """文件直接依赖的项目内文件，修改时间和大小与保存的一致时直接使用保存的结果"""
+        filepath = os.path.abspath(filepath)
+        if filepath in self.deps:
+            return self.deps[filepath]
+        stat = os.stat(filepath)
+        row = None
+        if self.conn is not None:
+            row = self.conn.execute('SELECT mtime_ns, size, deps FROM imports WHERE file = ?', (filepath,)).fetchone()
+        if row is not None and tuple(row[:2]) == (stat.st_mtime_ns, stat.st_size):
+            deps = json.loads(row[2])
+        else:
+            deps = module_imports(filepath, self.root)
+            if self.conn is not None:
+                self.conn.execute('INSERT OR REPLACE INTO imports (file, mtime_ns, size, deps) VALUES (?, ?, ?, ?)',
+                                  (filepath, stat.st_mtime_ns, stat.st_size, json.dumps(deps)))
+        self.deps[filepath] = deps
+        return deps
+
+    def closure(self, filepath):
+        """直接和间接依赖的文件，不含文件本身，已经删除的文件跳过"""
+        filepath = os.path.abspath(filepath)
+        seen = {filepath}
+        queue = collections.deque([filepath])
+        result = []
+        while queue:
+            for dep in self.direct(queue.popleft()):
+                if dep not in seen and os.path.isfile(dep):
+                    seen.add(dep)
+                    queue.append(dep)
+                    result.append(dep)
+        return result
+
+    def digest(self, filepath):
+        if filepath not in self.digests:
+            self.digests[filepath] = file_digest(filepath)
+        return self.digests[filepath]
+
+    def dependencies(self, filepath):
+        """
+        :return: [(依赖文件的绝对路径, 内容的sha256), ...]，作为缓存key的一部分
+        """
+        return [(dep, self.digest(dep)) for dep in self.closure(filepath)]
+
+    def dependents(self, changed, filepaths):
+        """
+        :param changed: 修改过的文件
+        :param filepaths: 候选的文件，如项目中所有的py文件
+        :return: filepaths中直接或间接import了changed中任一文件的文件，不含changed本身
+        """
+        changed = {os.path.abspath(filepath) for filepath in changed}
+        reverse = collections.defaultdict(list)
+        for filepath in filepaths:
+            for dep in self.direct(filepath):
+                reverse[dep].append(filepath)
+        seen = set(changed)
+        queue = collections.deque(changed)
+        result = []
+        while queue:
+            for filepath in reverse.get(queue.popleft(), []):
+                if os.path.abspath(filepath) not in seen:
+                    seen.add(os.path.abspath(filepath))
+                    queue.append(os.path.abspath(filepath))
+                    result.append(filepath)
+        return result
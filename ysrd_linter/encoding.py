@@ -0,0 +1,93 @@
+"""
+文件编码检测
+依次检查 BOM、PEP 263 编码声明、严格的utf-8解码，都不能确定时才用chardet检测文件开头的一部分内容，
+chardet是纯python实现，对整个大文件检测非常慢。结果按文件的修改时间和大小缓存，
+SingleFilechecker、pylint和astroid的语法树解析、提取数据库链接和接口时读取文件共用
+"""
+import codecs
+import os
+import re
+
+# chardet检测的内容长度(字节)
+SAMPLE_SIZE = 64 * 1024
+# PEP 263 编码声明，只在文件的前两行中有效
+CODING_COOKIE = re.compile(rb'^[ \t\f]*#.*?coding[:=][ \t]*([-\w.]+)')
+# 非ascii字节
+NON_ASCII = re.compile(rb'[\x80-\xff]')
+# utf-32的BOM以utf-16的BOM开头，先检查utf-32
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+# chardet检测出的中文编码都按它们的超集gb18030读取，避免检测样本之外出现的生僻字解码失败
+GB_ENCODINGS = {'gb2312', 'gbk', 'gb18030', 'hz-gb-2312'}
+
+# 文件路径 -> (mtime_ns, 文件大小, 编码)
+encoding_cache = {}
+
+
+def coding_cookie(data):
+    for line in data.split(b'\n', 2)[:2]:
+        match = CODING_COOKIE.match(line)
+        if match is not None:
+            try:
+                return codecs.lookup(match.group(1).decode('ascii')).name
+            except (LookupError, UnicodeDecodeError):
+                return None
+    return None
+
+
+def detect_bytes(data):
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    encoding = coding_cookie(data)
+    if encoding is not None:
+        return encoding
+    try:
+        data.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    import chardet
+
+    # 从第一个非ascii字符所在的行开始取样，前面的ascii内容对判断编码没有帮助
+    start = data.rfind(b'\n', 0, NON_ASCII.search(data).start()) + 1
+    encoding = chardet.detect(data[start:start + SAMPLE_SIZE])['encoding']
+    if encoding is not None and encoding.lower() in GB_ENCODINGS:
+        return 'gb18030'
+    return encoding
+
+
+def detect_encoding(filepath):
+    """
+    :return: 文件编码，chardet也无法判断时为None
+    """
+    stat = os.stat(filepath)
+    cached = encoding_cache.get(filepath)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(filepath, 'rb') as f:
+        encoding = detect_bytes(f.read())
+    encoding_cache[filepath] = (stat.st_mtime_ns, stat.st_size, encoding)
+    return encoding
+
+
+def undeclared_encoding(filepath):
+    """
+    astroid和pylint只认BOM和编码声明，其余文件都按utf-8读取，没有声明的GBK等文件会解析失败，
+    pylint 2.13中还会在生成E0001时崩溃，整批文件都没有结果
+    :return: 没有BOM和编码声明、又不是utf-8的文件返回检测出的编码，需要先按它解码再交给astroid；其他文件返回None
+    """
+    encoding = detect_encoding(filepath)
+    if encoding is None or codecs.lookup(encoding).name in ('utf-8', 'utf-8-sig'):
+        return None
+    with open(filepath, 'rb') as f:
+        head = f.read(SAMPLE_SIZE)
+    if any(head.startswith(bom) for bom, name in BOMS) or coding_cookie(head) is not None:
+        return None
+    return encoding
+
@@ -0,0 +1,133 @@
+"""
+项目文件清单
+只遍历一次项目目录，跳过node_modules、.git、__pycache__、虚拟环境等目录，
+按扩展名和文件名建立索引，供pylint检查、project_type和各个extract_*方法查询
+"""
+import collections
+import os
+
+# 不遍历的目录
+PRUNED_DIRS = {'node_modules', '.git', '.hg', '.svn', '__pycache__', '.tox', '.nox', '.mypy_cache',
+               '.pytest_cache', 'venv', '.venv'}
+
+
+def prune_dir(root, dirname, pruned_dirs=PRUNED_DIRS):
+    """不遍历的目录: pruned_dirs中的目录名，以及包含pyvenv.cfg的虚拟环境"""
+    if dirname in pruned_dirs:
+        return True
+    return os.path.exists(os.path.join(root, dirname, 'pyvenv.cfg'))
+
+
+def iter_tree(path, prune=prune_dir, visit=None):
+    """
+    按子目录在前、目录本身在后的顺序逐个返回 (root, dirs, files)，与原来os.walk(topdown=False)的检查顺序一致，
+    边遍历边返回，只保存还没有返回的上层目录
+    :param prune: prune(root, dirname)为True的目录不遍历
+    :param visit: 读取到一个目录时(在遍历它的子目录之前)调用visit(root, files)，可以修改files
+    """
+    stack = [(path, None)]
+    while stack:
+        root, entry = stack.pop()
+        if entry is not None:
+            yield entry
+            continue
+        walked = next(os.walk(root), None)
+        if walked is None:
+            continue
+        dirs = [dirname for dirname in walked[1] if not prune(root, dirname)]
+        files = walked[2]
+        if visit is not None:
+            visit(root, files)
+        stack.append((root, (root, dirs, files)))
+        # 与os.walk一致，不进入指向目录的符号链接
+        stack.extend((os.path.join(root, dirname), None) for dirname in reversed(dirs)
+                     if not os.path.islink(os.path.join(root, dirname)))
+
+
+class ProjectInventory():
+
+    def __init__(self, path, pruned_dirs=PRUNED_DIRS, scan=True):
+        """
+        :param path: 项目文件夹
+        :param pruned_dirs: 不遍历的目录名，另外包含pyvenv.cfg的目录视为虚拟环境，同样跳过
+        :param scan: 为False时不在这里遍历，由调用方通过walk边遍历边记录
+        """
+        self.path = path
+        self.pruned_dirs = set(pruned_dirs)
+        # [(root, dirs, files), ...]，顺序与os.walk(path, topdown=False)一致
+        self.tree = []
+        # 扩展名 -> [文件路径, ...]
+        self.by_ext = collections.defaultdict(list)
+        # 文件名 -> [文件路径, ...]
+        self.by_name = collections.defaultdict(list)
+        self.dir_names = set()
+        self.indexed = False
+        if scan:
+            self.scan()
+
+    def prune(self, root, dirname):
+        return prune_dir(root, dirname, self.pruned_dirs)
+
+    def scan(self):
+        for entry in self.walk():
+            pass
+
+    def walk(self, visit=None):
+        """
+        与iter_tree相同，边遍历边返回，同时记入清单，YsrdLinter.check边遍历边检查时与extract_*等共用这一次遍历
+        :param visit: 见iter_tree，对files的修改(如新建的__init__.py)同样记入清单
+        """
+        for root, dirs, files in iter_tree(self.path, self.prune, visit):
+            self.tree.append((root, dirs, files))
+            self.dir_names.update(dirs)
+            self.indexed = False
+            yield root, dirs, files
+
+    def index(self):
+        """按遍历顺序建立扩展名和文件名索引，add之后在下一次查询时重建"""
+        if self.indexed:
+            return
+        self.by_ext.clear()
+        self.by_name.clear()
+        for root, dirs, files in self.tree:
+            for file in files:
+                filepath = os.path.join(root, file)
+                self.by_ext[os.path.splitext(file)[1]].append(filepath)
+                self.by_name[file].append(filepath)
+        self.indexed = True
+
+    def add(self, filepath):
+        """记录遍历之后新建的文件，如init_folder新建的__init__.py"""
+        root, name = os.path.split(filepath)
+        for item in self.tree:
+            if item[0] == root:
+                item[2].append(name)
+                self.indexed = False
+                break
+
+    def files(self, *exts, under=None):
+        """
+        :param exts: 扩展名，如 '.py'，按遍历顺序返回
+        :param under: 只返回该目录下的文件
+        """
+        self.index()
+        if len(exts) == 1:
+            filepaths = list(self.by_ext.get(exts[0], []))
+        else:
+            filepaths = [os.path.join(root, file) for root, dirs, files in self.tree
+                         for file in files if os.path.splitext(file)[1] in exts]
+        if under is not None:
+            under = os.path.join(under, '')
+            filepaths = [filepath for filepath in filepaths if filepath.startswith(under)]
+        return filepaths
+
+    def named(self, name):
+        self.index()
+        return list(self.by_name.get(name, []))
+
+    def has_file(self, name):
+        self.index()
+        return len(self.by_name.get(name, [])) > 0
+
+    def has_dir(self, name):
+        return name in self.dir_names
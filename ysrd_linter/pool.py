@@ -0,0 +1,281 @@
+"""
+常驻的pylint子进程池
+pylint/astroid会一直占用内存不释放(https://github.com/PyCQA/astroid/issues/792)，原来每次检查都新建子进程运行pylint，
+每个子进程都要重新启动解释器、导入pylint和astroid。这里的子进程在检查之间保持运行，复用已经导入的模块，
+只有在内存(RSS)超过max_memory或者执行了max_tasks个任务后才退出，由进程池补充新的进程，既防止内存泄漏又省去启动开销
+"""
+import functools
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+import traceback
+
+# 子进程的内存上限(M)
+WORKER_MAX_MEMORY = 1024
+# 子进程最多执行的任务数，None为不限
+WORKER_MAX_TASKS = 200
+
+
+def clear_inference_caches():
+    """
+    astroid的推断结果和pylint、astroid中各个functools.lru_cache(transform、名称查找、checker的工具函数等)
+    都以语法树节点为key，从astroid_cache中移除的模块仍被这些缓存引用，不清空时语法树不会被回收，
+    内存随检查的文件数一直增长
+    """
+    from astroid.context import _INFERENCE_CACHE
+    from astroid.inference_tip import clear_inference_tip_cache
+
+    clear_inference_tip_cache()
+    _INFERENCE_CACHE.clear()
+    for name, module in list(sys.modules.items()):
+        if name.split('.')[0] not in ('astroid', 'pylint') or module is None:
+            continue
+        for value in list(vars(module).values()):
+            members = list(vars(value).values()) if isinstance(value, type) else []
+            for member in [value] + members:
+                if isinstance(member, functools._lru_cache_wrapper):
+                    member.cache_clear()
+
+
+def file_stat(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def record_module_stat(module):
+    """
+    astroid的transform，在每个模块解析完成时记下源文件的(mtime_ns, 文件大小)，
+    之后用来判断缓存的语法树是否还对应文件当前的内容
+    """
+    if module.file is not None:
+        try:
+            module.ysrd_stat = file_stat(module.file)
+        except OSError:
+            module.ysrd_stat = None
+
+
+def watch_module_stats():
+    from astroid import MANAGER, nodes
+
+    MANAGER.register_transform(nodes.Module, record_module_stat)
+
+
+def evict_stale_modules(filepaths=()):
+    """
+    astroid按模块名缓存语法树，常驻的子进程中文件修改后会读到旧的语法树，
+    把源文件的(mtime_ns, 文件大小)与解析时记下的不一致(或已删除、没有记录)的模块从缓存中移除；
+    filepaths(本次任务要检查的文件)对应的模块总是移除，修改后mtime和大小都不变的文件也会重新解析
+    """
+    from astroid import MANAGER
+
+    filepaths = {os.path.abspath(path) for path in filepaths}
+    evicted = False
+    for name, module in list(MANAGER.astroid_cache.items()):
+        path = getattr(module, 'file', None)
+        if path is None:
+            continue
+        if os.path.abspath(path) not in filepaths:
+            try:
+                if getattr(module, 'ysrd_stat', None) == file_stat(path):
+                    continue
+            except OSError:
+                pass
+        del MANAGER.astroid_cache[name]
+        evicted = True
+    if evicted:
+        clear_inference_caches()
+
+
+def task_filepaths(args):
+    """
+    任务参数中的py文件路径: pylint_plugin_check的文件列表、pylint_check的输入文件
+    """
+    for arg in args:
+        for path in arg if isinstance(arg, (list, tuple)) else [arg]:
+            if isinstance(path, str) and path.endswith('.py'):
+                yield path
+
+
+def evict_project_modules(root):
+    """
+    移除项目文件夹中的模块，只保留标准库和第三方库的语法树:
+    常驻的子进程换到另一个项目检查时，astroid按模块名查找import的模块，不移除时另一个项目中的同名模块(如 app.config)
+    会用到这个项目的语法树；检查完一批文件后移除，子进程的内存不随项目的文件数增长
+    """
+    from astroid import MANAGER
+
+    root = os.path.join(root, '')
+    for name, module in list(MANAGER.astroid_cache.items()):
+        path = getattr(module, 'file', None)
+        if path is not None and os.path.abspath(path).startswith(root):
+            del MANAGER.astroid_cache[name]
+    clear_inference_caches()
+
+
+def worker_main(tasks, done, slot, limit):
+    """
+    子进程：逐个取出任务执行，结果或异常交回主进程，
+    每个任务结束后检查内存和任务数，超过上限就退出；
+    进程池的jobs调小后，序号slot不小于limit的子进程把取到的任务放回队列后退出
+    multiprocessing.Queue在后台线程中pickle，put时不会抛出异常，无法pickle的结果会被丢弃、主进程一直等待，
+    所以先在这里pickle，失败时只返回错误信息
+    """
+    import psutil
+
+    process = psutil.Process(os.getpid())
+    watch_module_stats()
+    count = 0
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        if slot >= limit.value:
+            tasks.put(task)
+            return
+        task_id, func, args, max_memory, max_tasks = task
+        evict_stale_modules(task_filepaths(args))
+        try:
+            payload = (True, func(*args))
+        except Exception as e:
+            payload = (False, (e, traceback.format_exc()))
+        try:
+            data = pickle.dumps(payload)
+        except Exception as e:
+            # 结果或异常无法pickle时只返回错误信息
+            error, tb = payload[1] if not payload[0] else (e, traceback.format_exc())
+            data = pickle.dumps((False, (RuntimeError(str(error)), tb)))
+        done.put((task_id, data))
+        count += 1
+        if max_tasks is not None and count >= max_tasks:
+            return
+        if process.memory_info().rss / 1024 / 1024 > max_memory:
+            return
+
+
+class WorkerPool():
+
+    def __init__(self, jobs=None, max_memory=WORKER_MAX_MEMORY, max_tasks=WORKER_MAX_TASKS):
+        """
+        :param jobs: 最多同时运行的子进程数，默认为cpu核数，子进程在有任务时才启动
+        :param max_memory: 子进程的内存上限(M)，超过后该进程执行完当前任务就退出
+        :param max_tasks: 子进程最多执行的任务数，None为不限
+        """
+        # 子进程读取的jobs，调小后多出的子进程在取到下一个任务时退出
+        self.limit = multiprocessing.Value('i', jobs if jobs else (os.cpu_count() or 1))
+        self.max_memory = max_memory
+        self.max_tasks = max_tasks
+        self.tasks = multiprocessing.Queue()
+        self.done = multiprocessing.Queue()
+        self.workers = []
+        self.ids = itertools.count()
+
+    @property
+    def jobs(self):
+        return self.limit.value
+
+    @jobs.setter
+    def jobs(self, jobs):
+        """调小jobs时通知多出的子进程退出，空闲的子进程取到None后退出，正在执行任务的在下一个任务时退出"""
+        self.limit.value = jobs
+        for slot, worker in self.workers:
+            if slot >= jobs:
+                self.tasks.put(None)
+
+    def check_workers(self, wanted):
+        """清理已经退出的子进程，异常退出时抛出RuntimeError，再补足wanted个子进程"""
+        exitcodes = [worker.exitcode for slot, worker in self.workers
+                     if not worker.is_alive() and worker.exitcode != 0]
+        self.workers = [(slot, worker) for slot, worker in self.workers if worker.is_alive()]
+        if len(exitcodes) > 0:
+            raise RuntimeError(f'pylint子进程异常退出，exitcode: {exitcodes[0]}')
+        used = {slot for slot, worker in self.workers}
+        for slot in range(min(self.jobs, wanted)):
+            if slot in used:
+                continue
+            worker = multiprocessing.Process(target=worker_main, args=(self.tasks, self.done, slot, self.limit),
+                                             daemon=True)
+            worker.start()
+            self.workers.append((slot, worker))
+
+    def imap_unordered(self, func, items):
+        """
+        把items逐个交给子进程执行func(item)，按完成的先后返回
+        :return: 生成器 (item的下标, 结果)，任务抛出的异常在主进程中重新抛出
+        """
+        return self.starmap_unordered(func, ((item,) for item in items))
+
+    def starmap_unordered(self, func, iterable):
+        """与imap_unordered相同，iterable中的每一项是func的参数元组"""
+        ids = {self.submit(func, *args): index for index, args in enumerate(iterable)}
+        while len(ids) > 0:
+            task_id, result = self.wait(ids)
+            yield ids.pop(task_id), result
+
+    def submit(self, func, *args):
+        """把func(*args)交给子进程执行，不等待结果，返回任务id，结果用wait取得"""
+        task_id = next(self.ids)
+        self.tasks.put((task_id, func, args, self.max_memory, self.max_tasks))
+        return task_id
+
+    def wait(self, ids):
+        """
+        等待ids中的任一任务完成
+        :return: (任务id, 结果)，任务抛出的异常在主进程中重新抛出
+        """
+        while True:
+            self.check_workers(len(ids))
+            try:
+                task_id, data = self.done.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # 之前中断的调用中剩下的任务，结果直接丢弃
+            if task_id not in ids:
+                continue
+            try:
+                ok, result = pickle.loads(data)
+            except Exception as e:
+                # 异常类的参数与__init__不一致时无法在主进程中还原
+                ok, result = False, (RuntimeError(f'无法读取子进程的结果: {e!r}'), '')
+            if not ok:
+                exception, tb = result
+                raise exception
+            return task_id, result
+
+    def apply(self, func, *args):
+        """在子进程中执行func(*args)并等待结果"""
+        for index, result in self.starmap_unordered(func, [args]):
+            return result
+
+    def close(self):
+        """通知所有子进程退出并等待结束"""
+        for slot, worker in self.workers:
+            self.tasks.put(None)
+        for slot, worker in self.workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = []
+
+
+# 进程内共用的进程池，多次检查复用同一批子进程
+shared_pool = None
+
+
+def get_pool(jobs=None, max_memory=None, max_tasks=None):
+    """
+    返回进程内共用的WorkerPool，参数不为None时更新进程池的设置，新的设置从下一个任务开始生效，
+    jobs比之前小时多出的子进程会退出
+    """
+    global shared_pool
+    if shared_pool is None:
+        shared_pool = WorkerPool(jobs)
+    if jobs:
+        shared_pool.jobs = jobs
+    if max_memory is not None:
+        shared_pool.max_memory = max_memory
+    if max_tasks is not None:
+        shared_pool.max_tasks = max_tasks
+    return shared_pool
@@ -0,0 +1,153 @@
+"""
+检查过程的性能记录
+按阶段和文件记录耗时(wall)、CPU时间、内存(RSS)和阶段内的内存峰值，每条记录通过hooks回调实时交给调用方，
+也可以写成json，并汇总各阶段的总耗时、最慢的文件和内存峰值最高的文件。
+pylint在子进程中运行，每个文件的记录在子进程中测量后随检查结果交回主进程
+"""
+import collections
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+
+# wall、cpu单位为秒，rss为阶段结束时进程的内存(M)，rss_delta为阶段内内存的增长(M)，
+# peak为阶段内进程内存(RSS)的最高值(M)，peak_delta为它比阶段开始时多用的内存(M)，阶段中申请后又释放的内存也计算在内
+StageRecord = collections.namedtuple('StageRecord', ['stage', 'file', 'wall', 'cpu', 'rss', 'rss_delta', 'peak',
+                                                     'peak_delta', 'pid'])
+# 汇总中列出的文件数
+PROFILE_TOP = 10
+# 正在测量的阶段，阶段可以嵌套，重置内存最高值前先记到外层的阶段中
+active_measures = []
+
+
+def current_rss():
+    import psutil
+
+    return psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024
+
+
+def peak_rss():
+    """
+    进程内存的最高值(M)，linux上读/proc/self/status中的VmHWM，可以用reset_peak_rss重置；
+    其他系统用getrusage的ru_maxrss，是进程启动以来的最高值，只有超过之前的最高值时才能反映阶段内的峰值
+    """
+    try:
+        with open('/proc/self/status') as f:
+            match = re.search(r'^VmHWM:\s+(\d+) kB', f.read(), re.M)
+        if match is not None:
+            return int(match.group(1)) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        # windows没有resource，psutil的peak_wset是进程启动以来的最高值
+        import psutil
+
+        info = psutil.Process(os.getpid()).memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 / 1024
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS上单位是字节，linux上是KB
+    return maxrss / 1024 / 1024 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def reset_peak_rss():
+    """把VmHWM重置为当前的RSS(linux 4.0以上)，之前的最高值先记到正在测量的阶段中"""
+    peak = peak_rss()
+    for measure in active_measures:
+        measure.peak = max(measure.peak, peak)
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class Measure():
+    """从构造开始计时，stop时生成一条StageRecord"""
+
+    def __init__(self):
+        reset_peak_rss()
+        self.rss = current_rss()
+        self.peak = 0.0
+        active_measures.append(self)
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+
+    def stop(self, stage, file=None):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        rss = current_rss()
+        peak = max(self.peak, peak_rss(), rss)
+        if self in active_measures:
+            active_measures.remove(self)
+        return StageRecord(stage, file, wall, cpu, rss, rss - self.rss, peak, peak - self.rss, os.getpid())
+
+
+class Profiler():
+
+    def __init__(self, path=None, hooks=None, top=PROFILE_TOP):
+        """
+        :param path: json文件路径，不为None时YsrdLinter.check和SingleFilechecker.check结束后写出
+        :param hooks: 回调函数列表，每产生一条记录调用一次 hook(StageRecord)
+        :param top: 汇总中列出的最慢、内存峰值最高的文件数
+        """
+        self.path = path
+        self.hooks = list(hooks or [])
+        self.top = top
+        self.records = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def add(self, record):
+        self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    @contextlib.contextmanager
+    def stage(self, stage, file=None):
+        measure = Measure()
+        try:
+            yield
+        finally:
+            self.add(measure.stop(stage, file))
+
+    def summary(self, top=None):
+        """
+        :return: {'stages': {阶段: {'count', 'wall', 'cpu', 'max_rss'}}, 'peak_rss': {进程号: 记录到的最大RSS},
+                  'slowest': 最慢的文件记录, 'memory': 比开始时多用的内存峰值(peak_delta)最高的文件记录}
+        """
+        top = top or self.top
+        stages = {}
+        peaks = {}
+        for record in self.records:
+            item = stages.setdefault(record.stage, {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'max_rss': 0.0})
+            item['count'] += 1
+            item['wall'] += record.wall
+            item['cpu'] += record.cpu
+            item['max_rss'] = max(item['max_rss'], record.peak)
+            peaks[record.pid] = max(peaks.get(record.pid, 0.0), record.peak)
+        files = [record for record in self.records if record.file is not None]
+        return {
+            'stages': stages,
+            'peak_rss': peaks,
+            'slowest': [record._asdict() for record in sorted(files, key=lambda record: -record.wall)[:top]],
+            'memory': [record._asdict() for record in sorted(files, key=lambda record: -record.peak_delta)[:top]],
+        }
+
+    def dump(self, path=None):
+        """把全部记录和汇总写成json"""
+        path = path or self.path
+        with open(path, 'w') as f:
+            json.dump({'summary': self.summary(), 'records': [record._asdict() for record in self.records]}, f,
+                      ensure_ascii=False, indent=2)
+
+
+def stage(profiler, name, file=None):
+    """profiler为None时不做任何记录"""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name, file)
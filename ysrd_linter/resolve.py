@@ -0,0 +1,270 @@
+"""
+在astroid语法树上做常量传播，还原f-string、str.format、%格式化和+拼接得到的字符串
+变量的值来自函数、类和模块中的字符串常量赋值，以及 from ... import / import 导入的其他模块中的常量，
+每个模块只解析一次，解析出的常量缓存在ConstantResolver中，多个文件导入同一个配置模块时不会重复解析
+"""
+import os
+
+from astroid import nodes
+
+from .depgraph import find_module_file
+from .ysrd_linter import parse_module
+
+
+class ResolveException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return (self.msg)
+
+
+class ConstantResolver():
+
+    def __init__(self, root=None):
+        """
+        :param root: 项目文件夹，import的模块在导入文件所在的文件夹及其上层直到root的各个文件夹中查找
+        """
+        self.root = os.path.abspath(root) if root else None
+        # 文件绝对路径 -> astroid Module，解析失败为None
+        self.modules = {}
+        # 作用域节点(模块、类、方法) -> {名称: 赋值的值节点 / 导入语句 / 类}
+        self.symbols = {}
+        # 节点 -> 还原出的值，还原失败为ResolveException
+        self.values = {}
+        # 正在还原的节点，避免 a = b; b = a 这样的循环引用
+        self.resolving = set()
+
+    def module(self, filepath):
+        filepath = os.path.abspath(filepath)
+        if filepath not in self.modules:
+            try:
+                self.modules[filepath] = parse_module(filepath)
+            except Exception:
+                self.modules[filepath] = None
+        return self.modules[filepath]
+
+    def release(self):
+        """
+        parse_module解析的模块同时保存在astroid的全局缓存中，只清空self.modules不会释放，
+        与SingleFilechecker.release_ast一样从astroid的缓存中移除这里解析的模块
+        """
+        from astroid import MANAGER
+
+        for module in self.modules.values():
+            if module is not None and MANAGER.astroid_cache.get(module.name) is module:
+                del MANAGER.astroid_cache[module.name]
+        self.modules.clear()
+        self.symbols.clear()
+        self.values.clear()
+
+    def find_module_file(self, modname, level, filepath):
+        """
+        按 from/import 语句找到被导入模块的文件
+        :param level: 相对导入的层级，from .config import X 为1，绝对导入为0或None
+        """
+        return find_module_file(modname, level, filepath, self.root)
+
+    def scope_symbols(self, scope):
+        """作用域中直接出现的赋值、导入和类定义，同名的以最后一次为准"""
+        if scope in self.symbols:
+            return self.symbols[scope]
+        symbols = {}
+        if isinstance(scope, (nodes.FunctionDef, nodes.Lambda)):
+            # 参数的值在运行时才知道
+            for name in scope.argnames():
+                symbols[name] = None
+        body = getattr(scope, 'body', None)
+        for stmt in body if isinstance(body, list) else []:
+            if isinstance(stmt, nodes.Assign):
+                for target in stmt.targets:
+                    if isinstance(target, nodes.AssignName):
+                        symbols[target.name] = stmt.value
+            elif isinstance(stmt, nodes.AnnAssign):
+                if isinstance(stmt.target, nodes.AssignName) and stmt.value is not None:
+                    symbols[stmt.target.name] = stmt.value
+            elif isinstance(stmt, nodes.ImportFrom):
+                for name, alias in stmt.names:
+                    symbols[alias or name] = (stmt, name)
+            elif isinstance(stmt, nodes.Import):
+                for name, alias in stmt.names:
+                    symbols[alias or name.split('.')[0]] = (stmt, name if alias else name.split('.')[0])
+            elif isinstance(stmt, nodes.ClassDef):
+                symbols[stmt.name] = stmt
+        self.symbols[scope] = symbols
+        return symbols
+
+    def lookup(self, name, node):
+        """按python的作用域规则由内向外查找名称，方法中不会看到类中的名称"""
+        scope = node.scope()
+        first = True
+        while scope is not None:
+            if first or not isinstance(scope, nodes.ClassDef):
+                symbols = self.scope_symbols(scope)
+                if name in symbols:
+                    return self.target(symbols[name])
+            first = False
+            scope = scope.parent.scope() if scope.parent is not None else None
+        raise ResolveException(f'{name} 未定义')
+
+    def target(self, symbol):
+        """把符号表中的导入语句换成被导入模块中对应的节点"""
+        if symbol is None:
+            raise ResolveException('方法参数无法还原')
+        if not isinstance(symbol, tuple):
+            return symbol
+        stmt, name = symbol
+        filepath = stmt.root().file
+        if isinstance(stmt, nodes.Import):
+            module_file = self.find_module_file(name, 0, filepath)
+            module = self.module(module_file) if module_file else None
+        else:
+            module_file = self.find_module_file(stmt.modname, stmt.level, filepath)
+            module = self.module(module_file) if module_file else None
+            if module is not None:
+                symbols = self.scope_symbols(module)
+                if name in symbols:
+                    return self.target(symbols[name])
+            # from pkg import config 导入的是模块
+            module_file = self.find_module_file('.'.join(filter(None, [stmt.modname, name])), stmt.level, filepath)
+            module = self.module(module_file) if module_file else None
+        if module is None:
+            raise ResolveException(f'找不到 {name} 所在的模块')
+        return module
+
+    def attribute(self, node):
+        """self.X、cls.X、类名.X、模块名.X"""
+        if isinstance(node.expr, nodes.Name) and node.expr.name in ('self', 'cls'):
+            owner = node.frame().parent.frame() if node.frame().parent is not None else None
+        else:
+            owner = self.evaluate_node(node.expr)
+        if not isinstance(owner, (nodes.ClassDef, nodes.Module)):
+            raise ResolveException(f'无法还原 {node.as_string()}')
+        symbols = self.scope_symbols(owner)
+        if node.attrname not in symbols:
+            raise ResolveException(f'{node.as_string()} 未定义')
+        return self.target(symbols[node.attrname])
+
+    def evaluate_node(self, node):
+        """名称和属性先找到定义的节点再还原，模块和类直接返回节点本身"""
+        if isinstance(node, nodes.Name):
+            node = self.lookup(node.name, node)
+        elif isinstance(node, nodes.Attribute):
+            node = self.attribute(node)
+        if isinstance(node, (nodes.ClassDef, nodes.Module)):
+            return node
+        return self.evaluate(node)
+
+    def evaluate(self, node):
+        """
+        还原节点的常量值，无法还原时抛出ResolveException，结果按节点缓存
+        """
+        if node in self.values:
+            value = self.values[node]
+            if isinstance(value, ResolveException):
+                raise value
+            return value
+        if node in self.resolving:
+            raise ResolveException(f'{node.as_string()} 循环引用')
+        self.resolving.add(node)
+        try:
+            value = self.compute(node)
+        except ResolveException as e:
+            self.values[node] = e
+            raise
+        except Exception as e:
+            # 格式化参数个数不对等情况
+            self.values[node] = ResolveException(f'无法还原 {node.as_string()}: {e}')
+            raise self.values[node]
+        finally:
+            self.resolving.discard(node)
+        self.values[node] = value
+        return value
+
+    def placeholder(self, node):
+        """字符串中无法还原的部分保留为 {表达式}，与f-string的写法一致"""
+        try:
+            return self.evaluate(node)
+        except ResolveException:
+            return '{' + node.as_string() + '}'
+
+    def compute(self, node):
+        if isinstance(node, nodes.Const):
+            return node.value
+        if isinstance(node, (nodes.Name, nodes.Attribute)):
+            value = self.evaluate_node(node)
+            if isinstance(value, (nodes.ClassDef, nodes.Module)):
+                raise ResolveException(f'{node.as_string()} 不是常量')
+            return value
+        if isinstance(node, nodes.JoinedStr):
+            return ''.join(self.formatted_value(value) for value in node.values)
+        if isinstance(node, nodes.BinOp) and node.op == '+':
+            left, right = self.placeholder(node.left), self.placeholder(node.right)
+            return left + right
+        if isinstance(node, nodes.BinOp) and node.op == '%':
+            left = self.evaluate(node.left)
+            if isinstance(node.right, nodes.Tuple):
+                right = tuple(self.placeholder(item) for item in node.right.elts)
+            elif isinstance(node.right, nodes.Dict):
+                right = {self.evaluate(key): self.placeholder(value) for key, value in node.right.items}
+            else:
+                right = self.placeholder(node.right)
+            return left % right
+        if isinstance(node, nodes.Call) and isinstance(node.func, nodes.Attribute) and node.func.attrname == 'format':
+            template = self.evaluate(node.func.expr)
+            if not isinstance(template, str) or any(isinstance(arg, nodes.Starred) for arg in node.args):
+                raise ResolveException(f'无法还原 {node.as_string()}')
+            args = [self.placeholder(arg) for arg in node.args]
+            kwargs = {}
+            for keyword in node.keywords or []:
+                if keyword.arg is None:
+                    raise ResolveException(f'无法还原 {node.as_string()}')
+                kwargs[keyword.arg] = self.placeholder(keyword.value)
+            return template.format(*args, **kwargs)
+        raise ResolveException(f'无法还原 {node.as_string()}')
+
+    def formatted_value(self, node):
+        if isinstance(node, nodes.Const):
+            return str(node.value)
+        try:
+            value = self.evaluate(node.value)
+        except ResolveException:
+            return '{' + node.value.as_string() + '}'
+        conversion = {ord('r'): repr, ord('s'): str, ord('a'): ascii}.get(node.conversion)
+        if conversion is not None:
+            value = conversion(value)
+        spec = ''.join(self.formatted_value(item) for item in node.format_spec.values) if node.format_spec else ''
+        return format(value, spec)
+
+    def strings(self, module):
+        """
+        模块中所有由字符串常量、f-string、format、%和+拼出来的字符串，
+        能整体还原的只返回最外层的表达式，不能还原的继续在子节点中查找
+        :return: [(节点, 还原出的字符串), ...]
+        """
+        results = []
+        stack = [module]
+        while stack:
+            node = stack.pop()
+            if is_string_expression(node):
+                try:
+                    value = self.evaluate(node)
+                except ResolveException:
+                    value = None
+                if isinstance(value, str):
+                    results.append((node, value))
+                    continue
+            stack.extend(reversed(list(node.get_children())))
+        return results
+
+
+def is_string_expression(node):
+    if isinstance(node, nodes.Const):
+        return isinstance(node.value, str)
+    if isinstance(node, nodes.JoinedStr):
+        return True
+    if isinstance(node, nodes.BinOp):
+        return node.op in ('+', '%')
+    if isinstance(node, nodes.Call):
+        return isinstance(node.func, nodes.Attribute) and node.func.attrname == 'format'
+    return False
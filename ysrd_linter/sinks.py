@@ -0,0 +1,159 @@
+"""
+检查结果的输出
+检查结果以Finding记录按文件顺序逐个交给各个sink写出，支持 文本日志、JSON Lines、CSV 三种格式
+"""
+import collections
+import csv
+import json
+import re
+import tempfile
+
+Finding = collections.namedtuple('Finding', ['file', 'line', 'col', 'code', 'symbol', 'message'])
+
+
+def format_pylint(finding):
+    """pylint默认的输出格式"""
+    return f'{finding.file}:{finding.line}:{finding.col}: {finding.code}: {finding.message} ({finding.symbol})'
+
+
+def format_ysrd(finding):
+    """YsrdLinter自定义检查的输出格式 文件:行号:代码:[名称] 提示信息 (错误类型)"""
+    return f'{finding.file}:{finding.line}:{finding.code}:{finding.message} ({finding.symbol})'
+
+
+# pylint的输出 文件:行号:列号: 代码: 提示信息 (错误类型)
+PYLINT_LINE = re.compile(r'^(?P<file>.+?):(?P<line>\d+):(?P<col>\d+): (?P<code>[A-Z]\d{4}): (?P<message>.*) \((?P<symbol>[^()]*)\)$')
+# 自定义检查的输出 文件:行号:代码:[名称] 提示信息 (错误类型)
+YSRD_LINE = re.compile(r'^(?P<file>.+?):(?P<line>\d+):(?P<code>[A-Z]{2}\d{3}):(?P<message>.*) \((?P<symbol>[^()]*)\)$')
+
+
+def parse_finding(line):
+    """把日志中的一行解析成Finding，不是检查结果的行返回None，提示信息中包含':'也可以正确解析"""
+    line = line.rstrip('\n')
+    match = PYLINT_LINE.match(line)
+    if match is not None:
+        return Finding(match['file'], int(match['line']), int(match['col']), match['code'], match['symbol'],
+                       match['message'])
+    match = YSRD_LINE.match(line)
+    if match is not None:
+        return Finding(match['file'], int(match['line']), None, match['code'], match['symbol'], match['message'])
+    return None
+
+
+class Sink():
+    """
+    sink的基类，YsrdLinter.check按文件顺序对每个文件调用一次write，全部文件完成后调用close
+    result: {'module': 模块名, 'pylint': [Finding, ...], 'ysrd': [Finding, ...]}
+    """
+
+    def write(self, filepath, result):
+        raise NotImplementedError
+
+    def close(self, evaluation=''):
+        pass
+
+
+class TextSink(Sink):
+    """
+    与pylint一致的文本日志：先按文件输出pylint的结果和评分，再在 ysrdlinter 部分输出自定义检查的结果
+    echo为True时同时在控制台打印写出的内容
+    """
+
+    def __init__(self, path, echo=False):
+        self.path = path
+        self.echo = echo
+        self.file = open(path, 'w')
+        # 自定义检查的结果在日志最后输出，先暂存在临时文件中，内存占用不随检查结果的条数增长
+        self.ysrd_lines = tempfile.TemporaryFile('w+')
+
+    def emit(self, lines):
+        if len(lines) == 0:
+            return
+        text = '\n'.join(lines) + '\n'
+        self.file.write(text)
+        if self.echo:
+            print(text, end='')
+
+    def write(self, filepath, result):
+        lines = []
+        if len(result.get('pylint', [])) > 0:
+            module = result.get('module')
+            lines.append(f'************* Module {module}' if module else '************* ')
+            lines.extend(format_pylint(finding) for finding in result['pylint'])
+        self.emit(lines)
+        self.ysrd_lines.writelines(format_ysrd(finding) + '\n' for finding in result.get('ysrd', []))
+
+    def close(self, evaluation=''):
+        if evaluation:
+            self.emit(evaluation.split('\n')[:-1])
+        self.emit(['************* ysrdlinter'])
+        self.ysrd_lines.seek(0)
+        for text in iter(lambda: self.ysrd_lines.read(1024 * 1024), ''):
+            self.file.write(text)
+            if self.echo:
+                print(text, end='')
+        self.ysrd_lines.close()
+        self.file.close()
+
+
+class JsonLinesSink(Sink):
+    """每个检查结果一行json"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, filepath, result):
+        findings = result.get('pylint', []) + result.get('ysrd', [])
+        if len(findings) > 0:
+            self.file.write(''.join(json.dumps(finding._asdict(), ensure_ascii=False) + '\n' for finding in findings))
+
+    def close(self, evaluation=''):
+        self.file.close()
+
+
+class CsvSink(Sink):
+    """每个检查结果一行csv，编码与统计文件一致使用gb18030，方便在excel中打开"""
+
+    def __init__(self, path, encoding='gb18030'):
+        self.path = path
+        self.file = open(path, 'w', encoding=encoding, newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(Finding._fields)
+
+    def write(self, filepath, result):
+        self.writer.writerows(result.get('pylint', []) + result.get('ysrd', []))
+
+    def close(self, evaluation=''):
+        self.file.close()
+
+
+class StatsSink(Sink):
+    """
+    按错误代码统计出现次数，写出 错误类型,次数,代码 的统计csv
+    只保存每个代码的计数，内存占用与日志大小无关
+    """
+
+    def __init__(self, path, encoding='gb18030'):
+        self.path = path
+        self.encoding = encoding
+        self.counts = collections.Counter()
+        # 代码 -> 错误类型
+        self.symbols = {}
+
+    def add(self, finding):
+        self.counts[finding.code] += 1
+        if finding.code not in self.symbols:
+            self.symbols[finding.code] = finding.symbol
+
+    def write(self, filepath, result):
+        for finding in result.get('pylint', []) + result.get('ysrd', []):
+            self.add(finding)
+
+    def close(self, evaluation=''):
+        with open(self.path, 'w', encoding=self.encoding, newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['错误类型', '次数', '代码'])
+            # 按次数从多到少排列，次数相同时按出现的先后顺序
+            for code, count in self.counts.most_common():
+                writer.writerow([self.symbols[code], count, code])
@@ -1,57 +1,163 @@
+import ast
+import bisect
+import collections
+import functools
+import io
+import itertools
 import os
 import re
 import tokenize
-import traceback
-import chardet
-import pandas as pd
-from pylint.lint import Run as PylintRun
-from pylint.lint.pylinter import PyLinter
-from pylint.typing import FileItem
-from astroid.nodes.node_classes import ImportFrom
-from astroid.nodes.node_classes import Import
-from astroid.nodes.scoped_nodes.scoped_nodes import FunctionDef
-from astroid.nodes.scoped_nodes.scoped_nodes import ClassDef
-import psutil
-import multiprocessing
-import importlib
-import inspect
-
-
-class Process(multiprocessing.Process):
-    # 包装多进程，使主进程可以捕获exception
-
-    def __init__(self, *args, **kwargs):
-        multiprocessing.Process.__init__(self, *args, **kwargs)
-        self._pconn, self._cconn = multiprocessing.Pipe()
-        self._exception = None
-
-    def run(self):
-        try:
-            multiprocessing.Process.run(self)
-            self._cconn.send(None)
-        except Exception as e:
-            tb = traceback.format_exc()
-            self._cconn.send((e, tb))
-
-    @property
-    def exception(self):
-        if self._pconn.poll():
-            self._exception = self._pconn.recv()
-        return self._exception
-
-
-def pylint_check(input, output):
+import math
+import configparser
+import subprocess
+from .extract import (clear_resolvers, find_apis, find_database_url, find_database_urls, is_comment, is_f_string,
+                      iter_api_classes, iter_map, line_symbols, mask_database_url, recover_f_string, scan_apis)
+from .encoding import detect_encoding, undeclared_encoding
+from .inventory import ProjectInventory
+from .cache import CACHE_MAX_SIZE, ResultCache, cache_salt
+from .depgraph import ImportGraph
+from .sinks import Finding, StatsSink, TextSink, format_ysrd, parse_finding
+from .pool import WORKER_MAX_MEMORY, WORKER_MAX_TASKS, evict_project_modules, get_pool
+from .profiling import Measure, stage
+
+__version__ = '1.0'
+
+# pandas、pylint、astroid、psutil、chardet 导入很慢，统一在第一次使用时再导入，
+# import ysrd_linter 以及 extract_api 等不需要检查的功能不必承担这部分导入时间
+
+
+RCFILE = os.path.join(os.path.dirname(__file__), 'google_standard.conf')
+# 每个pylint分片最多包含的文件数
+PYLINT_BATCH_SIZE = 50
+# check的流水线中同时在检查或等待输出的文件段数，每段最多 PYLINT_BATCH_SIZE*4*进程数 个文件，
+# 主进程只保留这些段的检查结果，内存不随项目的文件数增长
+PIPELINE_WINDOW = 2
+# pylint子进程的内存上限(M)，超过后该进程退出，由进程池重新拉起新的进程
+PYLINT_MAX_MEMORY = WORKER_MAX_MEMORY
+
+
+def pylint_check(input, output, profile=False):
     """
     pylint管理资源异常(不释放内存)问题，占用内存会随着程序运行时间一直增大，网上没有解决方案。
-    因此用多进程运行pylint程序，结束即杀死，可以解决这个问题。用多线程测试时无法解决，子线程结束后，主进程依然占用线程的内存资源
+    因此在子进程中运行pylint程序，用多线程测试时无法解决，子线程结束后，主进程依然占用线程的内存资源。
+    子进程由WorkerPool管理，内存超过上限后退出释放，未超过时继续用于下一次检查
     https://github.com/PyCQA/astroid/issues/792
     https://rtpg.co/2020/10/12/pylint-usage.html
     """
-    argv = [f'--rcfile={os.path.dirname(__file__)}/google_standard.conf', f'--output={output}', input]
+    from pylint.lint import Run as PylintRun
+    from .checker import YSRD_MSGIDS
+
+    measure = Measure() if profile else None
+    # 加载插件只为了按检测出的编码读取没有编码声明的文件，自定义检查由SingleFilechecker自己输出
+    argv = [f'--rcfile={RCFILE}', f'--output={output}', '--load-plugins=ysrd_linter.checker',
+            f'--disable={",".join(YSRD_MSGIDS.values())}', input]
     PylintRun(argv, do_exit=False)
+    # profile为True时返回子进程中测量的StageRecord
+    return measure.stop('lint_file', os.path.abspath(input)) if measure is not None else None
     # print('pylint_check进程：', os.getpid(), '当前进程的内存使用：%.4f M' % (psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024))
 
 
+def parse_module(filepath, modname=None):
+    """
+    用astroid解析py文件，与pylint解析文件的方式一致，SingleFilechecker和提取数据库链接共用
+    astroid只认编码声明，没有声明的GBK等文件按detect_encoding检测出的编码读取
+    解析失败时抛出astroid的AstroidBuildingError
+    """
+    from astroid import MANAGER
+    from astroid.builder import AstroidBuilder
+
+    encoding = undeclared_encoding(filepath)
+    if encoding is None:
+        return MANAGER.ast_from_file(filepath, modname or filepath, source=True)
+    with open(filepath, 'r', encoding=encoding) as f:
+        module = AstroidBuilder(MANAGER).string_build(f.read(), modname or filepath, filepath)
+    module.file_encoding = encoding
+    return module
+
+
+# 子进程中上一次检查的项目文件夹
+checked_root = None
+
+
+def pylint_plugin_check(filepaths, root=None, profile=False, release=False):
+    """
+    通过load-plugins加载ysrd_linter.checker运行pylint，YsrdLinter自定义检查与pylint共用同一次astroid解析
+    :param filepaths: py文件路径列表
+    :param root: 文件所在的项目文件夹，与上一次检查的项目不同时先移除上一个项目的语法树缓存
+    :param profile: 为True时每个文件的结果中增加'profile': [StageRecord, ...]
+    :param release: 为True时检查完后移除root中模块的语法树和astroid的推断缓存，子进程的内存不随检查的分片数增长，
+                    常驻进程只检查少量修改过的文件，保留语法树下次直接使用
+    :return: {文件绝对路径: {'module': 模块名, 'pylint': [Finding, ...], 'ysrd': [Finding, ...], 'stats': 该文件的统计信息,
+              'imports': {import的模块名: 是否不参与循环导入检查}}}
+    """
+    from pylint.lint import Run as PylintRun
+    # checker依赖本模块中的SingleFilechecker，在这里导入避免循环导入
+    from .checker import YsrdReporter
+
+    global checked_root
+    if root is not None:
+        if checked_root is not None and checked_root != root:
+            evict_project_modules(checked_root)
+        checked_root = root
+    reporter = YsrdReporter(profile=profile)
+    argv = [f'--rcfile={RCFILE}', '--load-plugins=ysrd_linter.checker', '--score=n']
+    run = PylintRun(argv + filepaths, reporter=reporter, do_exit=False)
+    reporter.collect_stats()
+    imports = import_edges(run.linter)
+    if release and root is not None:
+        evict_project_modules(root)
+        checked_root = None
+    for filepath, stats in reporter.stats.items():
+        if 'convention' in stats:
+            # 自定义检查的结果不计入pylint评分
+            stats['convention'] -= len(reporter.results[filepath]['ysrd'])
+        if 'refactor' in stats:
+            # 分片中的cyclic-import没有输出，由主进程按整个项目重新检查后计入
+            stats['refactor'] -= reporter.dropped.get(filepath, 0)
+        reporter.results[filepath]['stats'] = stats
+    for result in reporter.results.values():
+        result['imports'] = imports.get(result['module'], {})
+    for record in reporter.profile or []:
+        reporter.results[record.file].setdefault('profile', []).append(record)
+    return reporter.results
+
+
+def import_edges(linter):
+    """
+    pylint的imports checker在一次运行中记录的模块间import，分片只包含部分模块，
+    按模块返回后由主进程合并整个项目的import检查cyclic-import，见cyclic_import_findings
+    :return: {模块名: {import的模块名: 是否不参与循环导入检查(如TYPE_CHECKING中的import)}}
+    """
+    for checker in linter.get_checkers():
+        if checker.name == 'imports' and hasattr(checker, 'import_graph'):
+            excluded = checker._excluded_edges
+            return {module: {name: name in excluded.get(module, ()) for name in sorted(names)}
+                    for module, names in checker.import_graph.items()}
+    return {}
+
+
+def cyclic_import_findings(imports, filepath):
+    """
+    与pylint在一次运行中检查所有模块的结果一致，按合并后的import找出循环导入
+    :param imports: {模块名: {import的模块名: 是否不参与检查}}
+    :param filepath: 结果所属的文件，pylint把cyclic-import记在最后检查的模块上
+    :return: [Finding, ...]
+    """
+    from pylint.graph import get_cycles
+
+    graph = {module: {name for name, excluded in names.items() if not excluded} for module, names in imports.items()}
+    return [Finding(filepath, 1, 0, 'R0401', 'cyclic-import', f'Cyclic import ({" -> ".join(cycle)})')
+            for cycle in get_cycles(graph, vertices=list(graph))]
+
+
+# YsrdLinter自定义检查的代码: (提示信息, 错误类型)
+YSRD_MESSAGES = {
+    'FR001': ('Function has too many rows (%s/%s)', 'function has too many rows'),
+    'CF001': ('Class has too many functions (%s/%s)', 'class has too many functions'),
+    'NC001': ('Function or Class has no comments', 'no comments'),
+}
+
+
 class AstNodeException(Exception):
     def __init__(self, msg):
         self.msg = msg
@@ -68,8 +174,51 @@ class FilePathException(Exception):
         return (self.msg)
 
 
+class GitException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return (self.msg)
+
+
+def shard_target(total, jobs):
+    """使批数不少于进程数的4倍的每批总大小(字节)"""
+    return max(1, math.ceil(total / (jobs * 4)))
+
+
+def create_init_file(root, files, path):
+    """
+    检查的文件夹path本身和其中包含py文件的文件夹没有__init__.py时新建，init_folder和边遍历边检查时共用
+    :param files: root中的文件名
+    :return: 是否新建了__init__.py
+    """
+    if '__init__.py' in files:
+        return False
+    if root != path and not any(os.path.splitext(file)[1] == '.py' for file in files):
+        return False
+    with open(os.path.join(root, '__init__.py'), 'a') as f:
+        f.write('')
+    return True
+
+
 class YsrdLinter():
-    def __init__(self, filepath, output=None):
+    def __init__(self, filepath, output=None, jobs=None, max_memory=PYLINT_MAX_MEMORY, max_tasks=WORKER_MAX_TASKS,
+                 no_cache=False, cache_size=CACHE_MAX_SIZE, changed_since=None, changed_lines_only=False,
+                 read_only=False, profiler=None):
+        """
+        :param filepath: 文件夹或者py文件路径
+        :param output: 日志路径
+        :param jobs: 检查文件夹时并行的进程数，默认为cpu核数，pylint总是在子进程中运行，为1时只用一个子进程
+        :param max_memory: 每个pylint子进程的内存上限(M)，超过后回收该进程
+        :param max_tasks: 每个pylint子进程最多检查的分片数，达到后回收该进程，None为只按内存回收
+        :param no_cache: 为True时不读写检查结果缓存，所有文件重新检查
+        :param cache_size: 缓存文件的大小上限(字节)
+        :param changed_since: git的分支、tag或commit，如'origin/main'，只检查当前分支从它分出后修改和新增的py文件
+        :param changed_lines_only: 配合changed_since使用，只输出修改过的行上的检查结果
+        :param read_only: 为True时不在检查的文件夹中新建__init__.py，只把py文件列表交给pylint，用于只读的目录
+        :param profiler: profiling.Profiler，记录check各阶段和每个文件的耗时、CPU时间和内存
+        """
         if not os.path.exists(filepath):
             raise FilePathException(f'{filepath} 路径不存在')
 
@@ -80,107 +229,492 @@ class YsrdLinter():
         else:
             self.output = output
 
+        self.jobs = jobs if jobs else (os.cpu_count() or 1)
+        self.max_memory = max_memory
+        self.max_tasks = max_tasks
         self.csv_path = self.output.replace(os.path.splitext(self.output)[1], '.csv')
+        # 检查结果缓存，与日志放在一起
+        self.no_cache = no_cache
+        self.cache_size = cache_size
+        self.cache_path = os.path.splitext(self.output)[0] + '-cache.sqlite3'
+        self.changed_since = changed_since
+        self.changed_lines_only = changed_lines_only
+        # {文件绝对路径: [(起始行, 结束行), ...]}，只在changed_lines_only时使用
+        self.changed_lines = {}
+        self.read_only = read_only
+        self.profiler = profiler
+        # 项目文件清单，检查文件夹时只遍历一次，check、project_type和extract_*共用，见iter_filepaths
+        self.project_inventory = None
+
+        # 项目文件夹，检查单个文件时为文件所在的文件夹
+        self.root = os.path.abspath(filepath) if os.path.isdir(filepath) else os.path.dirname(os.path.abspath(filepath))
 
         if os.path.isdir(filepath):
             """
             module和单个文件的情况分开处理,如果某包含py文件的文件夹下没有__init__.py文件，
             pylint会报错 [Errno 2] No such file or directory: './__init__.py' (parse-error)
-            因此给这样的文件夹新建__init__.py文件
+            因此给这样的文件夹新建__init__.py文件，read_only时不新建，pylint只检查列出的py文件，不会出现这个错误
+            整个文件夹检查时在iter_filepaths遍历的同时新建，不在这里保存文件列表
             """
             self.module_path = filepath
-            self.init_folder(self.module_path)
-            self.filepaths = []
-            for root, dirs, files in os.walk(self.module_path, topdown=False):
-                for file in files:
-                    if os.path.splitext(file)[1] == '.py':
-                        self.filepaths.append(os.path.join(root, file))
+            if changed_since is not None:
+                # 只检查git中有变化的文件，不再遍历整个目录
+                self.filepaths = self.git_changed_files(self.module_path)
+                if not read_only:
+                    self.init_folder(self.module_path, self.filepaths)
 
         elif os.path.splitext(filepath)[1] == '.py':
-            self.filepath = filepath
+            if changed_since is not None:
+                changed = self.git_changed_files(os.path.dirname(filepath) or '.')
+                self.filepaths = [path for path in changed if os.path.abspath(path) == os.path.abspath(filepath)]
+            else:
+                self.filepath = filepath
 
         else:
             raise FilePathException(f'f{filepath}不符合要求，要求文件夹或者py格式!')
 
-    def init_folder(self, path):
-        """第一层 __init__.py必加"""
-        init_file = os.path.join(path, '__init__.py')
-        if not os.path.exists(init_file):
-            with open(os.path.join(path, '__init__.py'), 'a') as f:
-                f.write('')
-        for root, dirs, files in os.walk(path, topdown=False):
+    def init_folder(self, path, filepaths=None):
+        """
+        第一层 __init__.py必加
+        :param filepaths: 只给这些文件所在的文件夹新建__init__.py，为None时按文件清单处理整个path，
+                          新建的__init__.py同时记入文件清单，不需要重新遍历
+        """
+        if filepaths is not None:
+            for dirname in [path] + [os.path.dirname(filepath) for filepath in filepaths]:
+                init_file = os.path.join(dirname, '__init__.py')
+                if not os.path.exists(init_file):
+                    with open(init_file, 'a') as f:
+                        f.write('')
+            return
+        inventory = self.inventory if path == self.module_path else ProjectInventory(path)
+        for root, dirs, files in inventory.tree:
+            if create_init_file(root, files, path):
+                inventory.add(os.path.join(root, '__init__.py'))
+
+    @property
+    def inventory(self):
+        """项目文件清单，第一次使用时遍历self.module_path，之后直接使用缓存的结果"""
+        if self.project_inventory is None:
+            self.project_inventory = ProjectInventory(self.module_path)
+        return self.project_inventory
+
+    def git(self, path, *args):
+        try:
+            result = subprocess.run(['git', *args], cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, 'stderr', None) or b''
+            raise GitException(f'git {" ".join(args)} 执行失败: {stderr.decode(errors="replace").strip() or e}')
+        return result.stdout.decode()
+
+    def git_changed_files(self, path):
+        """
+        用git找出path下相对self.changed_since修改、新增、重命名和复制的py文件(包括未提交和未跟踪的文件)，
+        与self.changed_since和HEAD的merge base比较，changed_since在分支之后又有新的提交时，只在它上面修改的文件不算在内
+        :return: 文件路径列表，与path拼接后的路径
+        """
+        base = self.git(path, 'merge-base', self.changed_since, 'HEAD').strip()
+        fields = self.git(path, 'diff', '--name-status', '--relative', '-M', '--diff-filter=ACMR', '-z',
+                          base, '--', '.').split('\0')
+        # 新文件名 -> 重命名或复制前的文件名，其他文件为None
+        changed = {}
+        i = 0
+        while i < len(fields) and fields[i]:
+            if fields[i][0] in 'RC':
+                changed[fields[i + 2]] = fields[i + 1]
+                i += 3
+            else:
+                changed[fields[i + 1]] = None
+                i += 2
+        untracked = self.git(path, 'ls-files', '--others', '--exclude-standard', '-z', '--', '.').split('\0')
+        filepaths = []
+        for name in sorted(set(changed) | set(untracked)):
+            filepath = os.path.join(path, name) if path != '.' else name
+            if os.path.splitext(name)[1] == '.py' and os.path.isfile(filepath):
+                filepaths.append(filepath)
+                if self.changed_lines_only:
+                    self.changed_lines[os.path.abspath(filepath)] = self.git_changed_lines(
+                        path, name, base, name in untracked, changed.get(name))
+        return filepaths
+
+    def git_changed_lines(self, path, name, base, untracked=False, source=None):
+        """
+        解析 git diff -U0 的 @@ -a,b +c,d @@ 得到文件中修改过的行，未跟踪的文件返回None表示全部行
+        :param base: 比较的commit，changed_since和HEAD的merge base
+        :param source: 重命名或复制前的文件名，与新文件一起交给git diff，只有修改过的行算作变化，而不是整个文件
+        """
+        if untracked:
+            return None
+        lines = []
+        names = [name] if source is None else [source, name]
+        diff = self.git(path, 'diff', '-U0', '--relative', '-M', base, '--', *names)
+        for start, count in re.findall(r'^@@ -\S+ \+(\d+)(?:,(\d+))? @@', diff, re.M):
+            start, count = int(start), int(count) if count else 1
+            if count > 0:
+                lines.append((start, start + count - 1))
+        return lines
+
+    def filter_changed_lines(self, filepath, result):
+        """changed_lines_only时只保留修改过的行上的检查结果"""
+        changed = self.changed_lines.get(os.path.abspath(filepath))
+        if not self.changed_lines_only or changed is None:
+            return result
+        result = dict(result)
+        for key in ('pylint', 'ysrd'):
+            result[key] = [finding for finding in result.get(key, [])
+                           if any(start <= finding.line <= end for start, end in changed)]
+        return result
+
+    def check(self, if_print=True, if_csv=False, sinks=None):
+        """
+        pylint和YsrdLinter自定义检查在同一批pylint子进程中完成，检查结果按文件顺序交给各个sink输出，
+        日志先输出pylint的结果和评分，再在 ysrdlinter 部分输出自定义检查的结果
+        遍历文件、查缓存、pylint检查、输出是一条流水线，见iter_results
+        :param sinks: 除日志外的其他输出，如 [JsonLinesSink('result.jsonl'), CsvSink('result.csv')]
+        """
+        self.write_segments(self.iter_results(self.iter_filepaths()), if_print, if_csv, sinks)
+        self.dump_profile()
+
+    def dump_profile(self):
+        if self.profiler is not None and self.profiler.path is not None:
+            self.profiler.dump()
+
+    def iter_filepaths(self):
+        """
+        按检查顺序逐个返回需要检查的py文件，检查整个文件夹时边遍历边返回，
+        不是read_only时同时给遍历到的文件夹新建__init__.py，与init_folder一致；
+        遍历的结果记入文件清单，之后的project_type、extract_*不再遍历，已经有文件清单时直接使用
+        """
+        if hasattr(self, 'filepaths'):
+            yield from self.filepaths
+            return
+        if not hasattr(self, 'module_path'):
+            yield self.filepath
+            return
+        if self.project_inventory is not None:
+            if not self.read_only:
+                self.init_folder(self.module_path)
+            yield from self.inventory.files('.py')
+            return
+
+        def visit(root, files):
+            # 在遍历子文件夹之前新建，子文件夹中的文件交给pylint时上层的__init__.py已经存在
+            if not self.read_only and create_init_file(root, files, self.module_path):
+                files.append('__init__.py')
+
+        inventory = ProjectInventory(self.module_path, scan=False)
+        for root, dirs, files in inventory.walk(visit):
             for file in files:
                 if os.path.splitext(file)[1] == '.py':
-                    init_file = os.path.join(root, '__init__.py')
-                    if not os.path.exists(init_file):
-                        with open(os.path.join(root, '__init__.py'), 'a') as f:
-                            f.write('')
-                        break
+                    yield os.path.join(root, file)
+        # 遍历完整后才作为文件清单，中途停止的遍历不完整
+        self.project_inventory = inventory
 
-    def check(self, if_print=True, if_csv=False):
-        if hasattr(self, 'filepath'):
-            with open(self.output, 'a') as f:
-                f.write('************* ysrdlinter' + '\n')
-            self.singfilechecker = SingleFilechecker(self.filepath, self.output)
-            self.singfilechecker.check(if_print=if_print)
-
-        elif hasattr(self, 'filepaths'):
-
-            # os.path.dirname(__file__) 获取google_standard.conf在python库中的位置
-            p1 = Process(target=pylint_check, kwargs={'input': self.module_path, 'output': self.output})
-            p1.start()
-            p1.join()
-            if p1.exception:
-                exception, traceback = p1.exception
-                p1.terminate()
-                raise exception
-
-            with open(self.output, 'a') as f:
-                f.write('************* ysrdlinter' + '\n')
-            for file in self.filepaths:
-                self.singfilechecker = SingleFilechecker(file, self.output)
-                self.singfilechecker.check(if_pylint=False, if_print=if_print)
+    def check_filepaths(self):
+        return list(self.iter_filepaths())
 
-        if if_csv:
-            self.output_csv()
+    def write_results(self, filepaths, results, if_print=True, if_csv=False, sinks=None):
+        """把各文件的检查结果和汇总评分交给日志和sinks输出"""
+        segment = [(filepath, results.get(os.path.abspath(filepath), {})) for filepath in filepaths]
+        self.write_segments([segment], if_print, if_csv, sinks)
 
-    def output_csv(self):
-        datas = []
-        fileObj = open(self.output, 'r')
-        for line in fileObj.readlines():
-            if line.count(':') == 2:
-                file, lineno, info = line.split(':')
-            elif line.count(':') == 3:
-                file, lineno, code, info = line.split(':')
-            elif line.count(':') == 4:
-                file, lineno, indent, code, info = line.split(':')
-            else:
+    def write_segments(self, segments, if_print=True, if_csv=False, sinks=None):
+        """
+        :param segments: 按文件顺序的若干段 [(文件路径, result), ...]，每段写出后不再保留，
+                         评分所需的统计信息边写边累加
+        pylint分片检查时看不到整个项目，cyclic-import按所有文件的import汇总后检查，
+        与pylint一次检查所有文件时一样记在最后一个文件上，因此最后一个文件等全部读完后再写出
+        """
+        sinks = [TextSink(self.output, echo=if_print)] + list(sinks or [])
+        if if_csv:
+            sinks.append(StatsSink(self.csv_path))
+        stats = collections.Counter()
+        # 模块名 -> {import的模块名: 是否不参与检查}
+        imports = {}
+        last = None
+        try:
+            for segment in segments:
+                with stage(self.profiler, 'write'):
+                    for filepath, result in segment:
+                        if last is not None:
+                            self.write_result(sinks, stats, *last)
+                        if 'module' in result:
+                            edges = imports.setdefault(result['module'], {})
+                            for name, excluded in result.get('imports', {}).items():
+                                edges[name] = edges.get(name, False) or excluded
+                        last = (filepath, result)
+            if last is not None:
+                filepath, result = last
+                cycles = cyclic_import_findings(imports, filepath)
+                if len(cycles) > 0:
+                    result = dict(result, pylint=result.get('pylint', []) + cycles)
+                    if 'stats' in result:
+                        refactor = result['stats'].get('refactor', 0) + len(cycles)
+                        result['stats'] = dict(result['stats'], refactor=refactor)
+                self.write_result(sinks, stats, filepath, result)
+        finally:
+            evaluation = self.evaluation([stats])
+            for sink in sinks:
+                sink.close(evaluation)
+
+    def write_result(self, sinks, stats, filepath, result):
+        stats.update(result.get('stats', {}))
+        result = self.filter_changed_lines(filepath, result)
+        for sink in sinks:
+            sink.write(filepath, result)
+
+    def check_with_cache(self, filepaths):
+        """
+        内容没有变化的文件直接使用缓存中的结果，其余文件交给pylint子进程检查后写入缓存
+        :return: {文件绝对路径: {'module': 模块名, 'pylint': [Finding, ...], 'ysrd': [Finding, ...], 'stats': {...}}}
+        """
+        with stage(self.profiler, 'cache_lookup'):
+            results, pending = self.cached_results(filepaths)
+        if len(pending) > 0:
+            with stage(self.profiler, 'pylint'):
+                new_results = self.pylint_check_shards(list(pending))
+            with stage(self.profiler, 'cache_save'):
+                self.save_results(pending, new_results)
+            results.update(new_results)
+        return results
+
+    def open_cache(self):
+        from importlib import metadata
+
+        return ResultCache(self.cache_path, cache_salt(RCFILE, versions=(
+            __version__, metadata.version('pylint'), metadata.version('astroid'))), self.cache_size)
+
+    def cached_results(self, filepaths):
+        """
+        :return: (缓存中已有的结果 {文件绝对路径: result}, 需要检查的文件 {文件路径: 缓存key})，no_cache时key为None
+        """
+        if self.no_cache:
+            return {}, {filepath: None for filepath in filepaths}
+        cache = self.open_cache()
+        try:
+            return self.lookup(cache, filepaths)
+        finally:
+            cache.close()
+
+    def lookup(self, cache, filepaths):
+        """在已经打开的缓存中查找filepaths的结果，返回值与cached_results相同"""
+        if cache is None:
+            return {}, {filepath: None for filepath in filepaths}
+        results = {}
+        pending = {}
+        # import的项目内文件的内容也是key的一部分，依赖修改后import它的文件也会重新检查
+        graph = ImportGraph(self.root, cache.conn)
+        for filepath in filepaths:
+            key = cache.key(filepath, graph.dependencies(filepath))
+            result = cache.get(key)
+            if result is None:
+                pending[filepath] = key
                 continue
-            if 'indent' in locals().keys():
-                lineno += ':' + indent
-
-            error_type = re.findall('\(.*?\)', line)[-1].replace('(', '').replace(')', '')
-
-            datas.append({
-                '文件名': file,
-                '位置': " " + lineno,
-                '报错信息': info,
-                '错误代码': code,
-                '错误类型': error_type
-            })
-            """
-            防止csv自动将日期转换
-            "=\"" + lineno + "\"",
-            https://www.itranslater.com/qa/details/2102459010002715648
-            """
-        df = pd.DataFrame(datas)
-        df_stat = pd.DataFrame()
-
-        df_stat['错误类型'] = list(df['错误类型'].value_counts().index)
-        df_stat['次数'] = list(df['错误类型'].value_counts().values)
-        df_stat['代码'] = list(df['错误代码'].value_counts().index)
+            for name in ('pylint', 'ysrd'):
+                result[name] = [Finding(*finding) for finding in result[name]]
+            results[os.path.abspath(filepath)] = result
+        return results, pending
+
+    def dependents(self, changed, filepaths):
+        """filepaths中直接或间接import了changed中任一文件的文件，changed修改后它们的检查结果也可能变化"""
+        if self.no_cache:
+            return ImportGraph(self.root).dependents(changed, filepaths)
+        cache = self.open_cache()
+        try:
+            return ImportGraph(self.root, cache.conn).dependents(changed, filepaths)
+        finally:
+            cache.close()
+
+    def save_results(self, pending, results):
+        """把新检查的结果按cached_results得到的key写入缓存"""
+        if self.no_cache or len(pending) == 0:
+            return
+        cache = self.open_cache()
+        try:
+            self.store(cache, pending, results)
+        finally:
+            cache.close()
+
+    def store(self, cache, pending, results):
+        if cache is None:
+            return
+        for filepath, key in pending.items():
+            result = results.get(os.path.abspath(filepath))
+            # 没有统计信息说明pylint没有完成该文件的检查，不写入缓存
+            if result is not None and 'stats' in result:
+                cache.set(key, result)
+
+    def shard(self, filepaths, target=None):
+        """
+        按文件顺序把文件切分成若干批，每批的总大小约为target字节且不超过PYLINT_BATCH_SIZE个文件，
+        target默认使批数不少于进程数的4倍以均衡负载，总大小大的批排在前面先交给子进程
+        """
+        sizes = [os.path.getsize(filepath) for filepath in filepaths]
+        if target is None:
+            target = shard_target(sum(sizes), self.jobs)
+        batches = []
+        batch, total = [], 0
+        for filepath, size in zip(filepaths, sizes):
+            if len(batch) > 0 and (total + size > target or len(batch) >= PYLINT_BATCH_SIZE):
+                batches.append((total, batch))
+                batch, total = [], 0
+            batch.append(filepath)
+            total += size
+        if len(batch) > 0:
+            batches.append((total, batch))
+        batches.sort(key=lambda item: item[0], reverse=True)
+        return [batch for total, batch in batches]
+
+    def pylint_check_shards(self, filepaths):
+        """
+        把filepaths分片后交给常驻的pylint子进程执行，各分片的结果交回主进程合并，
+        子进程在多次检查之间复用，内存超过max_memory或检查了max_tasks个分片后由进程池替换
+        :return: {文件绝对路径: {'module': 模块名, 'pylint': [Finding, ...], 'ysrd': [Finding, ...], 'stats': {...}}}
+        """
+        pool = get_pool(self.jobs, self.max_memory, self.max_tasks)
+        results = {}
+        tasks = [(batch, self.root, self.profiler is not None) for batch in self.shard(filepaths)]
+        for index, shard_results in pool.starmap_unordered(pylint_plugin_check, tasks):
+            results.update(self.collect_profile(shard_results))
+        return results
+
+    def iter_results(self, filepaths):
+        """
+        发现文件 -> 查缓存 -> pylint检查 -> 输出 的流水线，filepaths可以是生成器，按需读取:
+        文件按顺序分成每段最多 PYLINT_BATCH_SIZE*4*进程数 个，每段查完缓存后把需要检查的文件分片交给子进程，
+        同时最多有PIPELINE_WINDOW段在检查或等待输出，最前面的一段全部完成后写入缓存并交给调用方，
+        主进程中的检查结果、缓存key和import依赖图都只保留这几段的，子进程每检查完一个分片移除项目模块的语法树
+        :return: 生成器，按filepaths的顺序每段返回一次 [(文件路径, result), ...]
+        """
+        pool = get_pool(self.jobs, self.max_memory, self.max_tasks)
+        profile = self.profiler is not None
+        filepaths = iter(filepaths)
+        size = PYLINT_BATCH_SIZE * 4 * self.jobs
+        cache = None if self.no_cache else self.open_cache()
+        # 每段: [文件列表, 已有的结果, 需要检查的文件及缓存key, 未完成的分片数]
+        segments = collections.deque()
+        # 任务id -> 所属的段
+        running = {}
+        try:
+            while True:
+                while len(segments) < PIPELINE_WINDOW:
+                    chunk = list(itertools.islice(filepaths, size))
+                    if len(chunk) == 0:
+                        break
+                    with stage(self.profiler, 'cache_lookup'):
+                        results, pending = self.lookup(cache, chunk)
+                    segment = [chunk, results, pending, 0]
+                    for batch in self.shard(list(pending)):
+                        running[pool.submit(pylint_plugin_check, batch, self.root, profile, True)] = segment
+                        segment[3] += 1
+                    segments.append(segment)
+                if len(segments) == 0:
+                    break
+                if segments[0][3] > 0:
+                    with stage(self.profiler, 'pylint'):
+                        task_id, shard_results = pool.wait(running)
+                    segment = running.pop(task_id)
+                    segment[1].update(self.collect_profile(shard_results))
+                    segment[3] -= 1
+                    continue
+                chunk, results, pending, count = segments.popleft()
+                if cache is not None:
+                    with stage(self.profiler, 'cache_save'):
+                        self.store(cache, pending, results)
+                        cache.conn.commit()
+                yield [(filepath, results.get(os.path.abspath(filepath), {})) for filepath in chunk]
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def collect_profile(self, results):
+        """把子进程中按文件测量的记录交给profiler，不写入缓存和日志"""
+        for result in results.values():
+            for record in result.pop('profile', []):
+                self.profiler.add(record)
+        return results
+
+    @classmethod
+    def check_many(cls, paths, jobs=None, outputs=None, if_print=False, if_csv=False, **kwargs):
+        """
+        在同一批常驻的pylint子进程中检查多个项目，代替逐个项目新建YsrdLinter并check：
+        所有项目中需要检查的文件按大小切分成若干批一起排队，子进程在项目之间不空闲，
+        一个项目的文件全部检查完后立即写出该项目的日志
+        :param paths: 文件夹或py文件路径列表
+        :param jobs: 并行的进程数，默认为cpu核数
+        :param outputs: 与paths一一对应的日志路径，默认与YsrdLinter相同
+        :param kwargs: 其他传给YsrdLinter的参数，如max_memory、no_cache、read_only
+        :return: 生成器，按检查完成的先后返回各项目的YsrdLinter
+        """
+        linters = [cls(path, output=outputs[i] if outputs else None, jobs=jobs, **kwargs)
+                   for i, path in enumerate(paths)]
+        if len(linters) == 0:
+            return
+        # 每个项目: [文件列表, 已有的结果, 需要检查的文件及缓存key, 未完成的批数]
+        states = []
+        for linter in linters:
+            filepaths = linter.check_filepaths()
+            with stage(linter.profiler, 'cache_lookup'):
+                results, pending = linter.cached_results(filepaths)
+            states.append([filepaths, results, pending, 0])
+        total = sum(os.path.getsize(filepath) for state in states for filepath in state[2])
+        target = shard_target(total, linters[0].jobs)
+        owners = []
+        tasks = []
+        for i, (linter, state) in enumerate(zip(linters, states)):
+            for batch in linter.shard(list(state[2]), target):
+                owners.append(i)
+                tasks.append((batch, linter.root, linter.profiler is not None))
+                state[3] += 1
+
+        def finish(i):
+            filepaths, results, pending, count = states[i]
+            with stage(linters[i].profiler, 'cache_save'):
+                linters[i].save_results(pending, results)
+            linters[i].write_results(filepaths, results, if_print, if_csv)
+            linters[i].dump_profile()
+            states[i] = None
+            return linters[i]
+
+        for i, state in enumerate(states):
+            if state[3] == 0:
+                yield finish(i)
+        pool = get_pool(linters[0].jobs, linters[0].max_memory, linters[0].max_tasks)
+        for index, shard_results in pool.starmap_unordered(pylint_plugin_check, tasks):
+            state = states[owners[index]]
+            state[1].update(linters[owners[index]].collect_profile(shard_results))
+            state[3] -= 1
+            if state[3] == 0:
+                yield finish(owners[index])
+
+    def evaluation(self, file_stats):
+        """按rcfile中的evaluation公式汇总各文件的评分，与pylint整体运行时输出的评分格式一致"""
+        keys = ['fatal', 'error', 'warning', 'refactor', 'convention', 'statement', 'info']
+        stats = {key: sum(item.get(key, 0) for item in file_stats) for key in keys}
+        if stats['statement'] == 0:
+            return ''
+        config = configparser.RawConfigParser()
+        config.read(RCFILE)
+        try:
+            note = eval(config.get('REPORTS', 'evaluation'), {}, stats)
+        except Exception as e:
+            msg = f'An exception occurred while rating: {e}'
+        else:
+            msg = f'Your code has been rated at {note:.2f}/10'
+        return '\n' + '-' * len(msg) + '\n' + msg + '\n\n'
 
-        df_stat.to_csv(self.csv_path, encoding='gb18030', index=None)
+    def output_csv(self):
+        """
+        逐行读取日志统计各错误代码的次数，写出统计csv
+        check(if_csv=True)时直接统计检查结果，不再重新读取日志
+        """
+        stats = StatsSink(self.csv_path)
+        with open(self.output, 'r') as fileObj:
+            for line in fileObj:
+                finding = parse_finding(line)
+                if finding is not None:
+                    stats.add(finding)
+        stats.close()
 
     @property
     def project_type(self):
@@ -188,15 +722,10 @@ class YsrdLinter():
         判断项目属于前端还是api-framework或者yard-base或前端
         :return:
         """
-        all_files = []
-        all_dirs = []
-        for root, dirs, files in os.walk(self.module_path, topdown=False):
-            all_files.extend(files)
-            all_dirs.extend(dirs)
-        if 'package.json' in all_files:
+        if self.inventory.has_file('package.json'):
             return 'frontend'
-        elif 'runserver.py' in all_files:
-            if 'bin' in all_dirs:
+        elif self.inventory.has_file('runserver.py'):
+            if self.inventory.has_dir('bin'):
                 return 'yard-base'
             else:
                 return 'api-framework'
@@ -204,80 +733,52 @@ class YsrdLinter():
             return 'other'
 
     def check_f_string(self, text):
-        if 'f"' in text or "f'" in text:
-            if '{' in text and '}' in text:
-                return True
-            if '}' in text and '{' in text:
-                return True
-        return False
+        return is_f_string(text)
 
     def check_comment(self, text):
-        text = text.replace(' ', '')
-        if len(text) == 0:
-            return False
-        if text[0] == '#':
-            return True
-        return False
+        return is_comment(text)
 
     def recover_f_string(self, f_string, lines):
-        var_reg = '(?<={).+?(?=\})'
-        var_names = re.findall(var_reg, f_string)
-        var_dict = {}
-        for var_name in var_names:
-            for line in lines:
-                if f_string == line:
-                    break
-                line = line.replace(' ', '')
-                reg = f'(?<={var_name}\=[\'\"]).+?(?=[\'\"])'
-                var_value = re.findall(reg, line)
-                if len(var_value) != 0:
-                    var_dict[var_name] = var_value[0]
-        for var_name in var_dict.keys():
-            f_string = f_string.replace('{' + f'{var_name}' + '}', var_dict[var_name])
-        return f_string.replace(' ', '')
-
-    def extract_database_url(self):
-        datas = []
-        for root, dirs, files in os.walk(self.module_path, topdown=False):
-            for file in files:
-                if os.path.splitext(file)[1] == '.py':
-                    filepath = os.path.join(root, file)
-                    with open(filepath, 'r') as f:
-                        lines = f.readlines()
-                        for idx, line in enumerate(lines):
-                            database_url = self.extract_database_url_from_line(line, lines)
-                            if database_url == None:
-                                continue
-                            data = {'file': os.path.abspath(filepath).replace(self.module_path, ''),
-                                 'database_url': database_url.replace(re.search('(?<=\/\/).+?(?=\@)', database_url).group(), '账号密码已打码'), # 这里加密一下密码字段
-                                 'line': idx + 1, 'text': line}
-                            datas.append(data)
+        """用f_string所在行之前的字符串赋值还原其中的变量，见extract.recover_f_string"""
+        return recover_f_string(f_string, line_symbols(lines, f_string))
+
+    def iter_database_urls(self):
+        """
+        逐个文件扫描项目中的数据库链接，文件交给self.jobs个进程并行扫描，按文件顺序逐条返回
+        f-string、format等拼接出的链接在语法树上用项目中的常量还原，见resolve.ConstantResolver
+        :return: 生成器 {'file': 文件路径, 'database_url': 账号密码打码后的链接, 'line': 行号, 'text': 行内容}
+        """
+        filepaths = self.inventory.files('.py')
+        find = functools.partial(find_database_urls, root=self.module_path)
+        try:
+            for filepath, results in zip(filepaths, iter_map(find, filepaths, self.jobs)):
+                for line, text, database_url in results:
+                    yield {'file': os.path.abspath(filepath).replace(self.module_path, ''),
+                           'database_url': mask_database_url(database_url),  # 这里加密一下密码字段
+                           'line': line, 'text': text}
+        finally:
+            clear_resolvers()
+
+    def extract_database_url(self, as_dataframe=True):
+        """
+        :param as_dataframe: 为False时返回list，不需要pandas
+        """
+        datas = list(self.iter_database_urls())
+        if not as_dataframe:
+            return datas
+        import pandas as pd
+
         df = pd.DataFrame(datas)
         df.index = [i for i in range(len(df))]
         return df
 
     def extract_database_url_from_line(self, text, lines):
-        # 需要解决这种情况：mysql+pymysql://{username}:{password}@{host}:{port}/{database}?charset=utf8
-        # reg = '(?<=[\"\'`]).+\+.+:\/\/.+\:.+@.+\/.+(?=[\"\'`])'
-        if self.check_comment(text) == True:
-            return None
-
-        reg = '(?<=[\"\'])[^\"\']+\+.+:\/\/.+\:.+@.+\/.+(?=[\"\'`])'
-        result = re.search(reg, text)
-
-        if result == None:
-            return None
-        else:
-            database_url = result.group()
-        if self.check_f_string(text) == True:
-            try:
-                database_url = self.recover_f_string(text, lines)
-                return re.search(reg, database_url).group()
-            except:
-                pass
-        return database_url
+        """一行中的数据库链接，f-string中的变量用lines中该行之前的字符串赋值还原，见extract.find_database_url"""
+        return find_database_url(text, line_symbols(lines, text))
 
     def extract_api(self):
+        import pandas as pd
+
         if self.project_type == 'yard-base':
             df = self.extract_api_from_yard_base()
         elif self.project_type == 'api-framework':
@@ -289,37 +790,18 @@ class YsrdLinter():
         return df
 
     def extract_api_from_line(self, text):
-        reg_with_port = '(?<=[\"\'`])[http|https].+/.+:[0-9]+.+(?=[\"\'`])'
-        apis_with_port = re.findall(reg_with_port, text)
-
-        # reg = '(?<=[\"\'])/.+/.+(?=[\"\'])'
-        # reg = '/.+/.+(?=[\"\'`])'
-        reg = '(?<=[\"\'`])/.*?(?=[\"\'`])'
-        apis_without_port = re.findall(reg, text)
-
-        apis = set(apis_with_port + apis_without_port)
-        apis = [api for api in apis if ' ' not in api or '<' not in api or '(' not in api]
-        apis = [api for api in apis if len(api) < 100 and len(api) > 4]
-        return apis
+        """带端口的完整地址和以/开头的路径，正则见extract.API"""
+        return find_apis(text)
 
     def extract_api_from_yard_base(self):
+        """
+        src/app下每个AbstractApi的子类是一个接口，接口地址为 /文件夹/类名(驼峰转为-连接)
+        文件交给self.jobs个进程并行解析，结果按文件的修改时间和内容缓存，重复调用时只解析修改过的文件
+        """
         def get_default_url_name(cls_name):
             p = re.compile(r'([a-z]|\d)([A-Z])')
             return re.sub(p, r'\1-\2', cls_name).lower().replace('.py', '')
 
-        def get_class_name(file):
-            if file.endswith('.py'):
-                with open(file, 'r') as f:
-                    try:
-                        lines = f.readlines()
-                        for line in lines:
-                            if 'class' in line and 'AbstractApi' in line:
-                                class_name = line.split('class')[1].split('(AbstractApi')[0].replace(' ', '')
-                                return class_name
-                    except UnicodeDecodeError:
-                        return False
-            return False
-
         # def check_AbstractApi(file_name, package_name):
         #     不管用什么方法，都会由于api文件内的导包依旧找不到路径而 报错 ModuleNotFoundError: No module named 'framework'
         #     def find_module(self, fullname, path=None):
@@ -367,82 +849,109 @@ class YsrdLinter():
         #                 return True
         datas = []
         app_path = os.path.join(self.module_path, 'src', 'app')
-        for dir_path, dir_names, files in os.walk(app_path):
-            for file in files:
-                if '__pycache__' in dir_path:
-                    continue
-                file_full_path = os.path.join(dir_path, file)
-                class_name = get_class_name(file_full_path)
-                if class_name:
-                    file_path = os.path.join(dir_path.replace(app_path, ''), file)
-                    path1, path2 = os.path.split(file_path)
-                    if path1[0] != '/':
-                        path1 = '/' + path1
-
-                    url = os.path.join(path1, get_default_url_name(class_name))
-                    # url = '/'.join([get_default_url_name(item) for item in file_path.split('/')])
-                    datas.append({
-                        'file': file_full_path.replace(self.module_path, ''),
-                        'api': url,
-                        'line': '-'})
+        filepaths = self.inventory.files('.py', under=app_path)
+        for file_full_path, classes in iter_api_classes(filepaths, self.jobs):
+            dir_path, file = os.path.split(file_full_path)
+            for class_name, line in classes:
+                file_path = os.path.join(dir_path.replace(app_path, ''), file)
+                path1, path2 = os.path.split(file_path)
+                if path1[0] != '/':
+                    path1 = '/' + path1
+
+                url = os.path.join(path1, get_default_url_name(class_name))
+                # url = '/'.join([get_default_url_name(item) for item in file_path.split('/')])
+                datas.append({
+                    'file': file_full_path.replace(self.module_path, ''),
+                    'api': url,
+                    'line': line})
+        import pandas as pd
+
         df = pd.DataFrame(datas)
         df.index = [i for i in range(len(df))]
         return df
 
     def extract_api_from_api_framework(self):
         datas = []
-        for dir_path, dir_names, files in os.walk(self.module_path):
-            for file in files:
-                single_file_urls = []
-                if file == '__init__.py':
-                    with open(os.path.join(dir_path, file), 'r') as f:
-                        try:
-                            lines = f.readlines()
-                            for line in lines:
-                                if 'Blueprint(' in line:
-                                    reg = '(?<=[\"\'`]).+(?=[\"\'`])'
-                                    Blueprint_name = re.findall(reg, line)[0]
-                                if 'add_resource(' in line:
-                                    reg = '(?<=[\"\'`]).+(?=[\"\'`])'
-                                    url = re.findall(reg, line)
-                                    single_file_urls.extend(url)
-                        except UnicodeDecodeError:
-                            continue
-                if len(single_file_urls) > 0:
-                    single_file_urls = ['/' + Blueprint_name + url for url in single_file_urls]
-                    data = [{'file': os.path.abspath(os.path.join(dir_path, file)).replace(self.module_path, ''),
-                             'api': api,
-                             'line': '-'} for api in single_file_urls]
-                    datas.extend(data)
+        for filepath in self.inventory.named('__init__.py'):
+            single_file_urls = []
+            with open(filepath, 'r', encoding=detect_encoding(filepath)) as f:
+                try:
+                    lines = f.readlines()
+                    for line in lines:
+                        if 'Blueprint(' in line:
+                            reg = '(?<=[\"\'`]).+(?=[\"\'`])'
+                            Blueprint_name = re.findall(reg, line)[0]
+                        if 'add_resource(' in line:
+                            reg = '(?<=[\"\'`]).+(?=[\"\'`])'
+                            url = re.findall(reg, line)
+                            single_file_urls.extend(url)
+                except UnicodeDecodeError:
+                    continue
+            if len(single_file_urls) > 0:
+                single_file_urls = ['/' + Blueprint_name + url for url in single_file_urls]
+                data = [{'file': os.path.abspath(filepath).replace(self.module_path, ''),
+                         'api': api,
+                         'line': '-'} for api in single_file_urls]
+                datas.extend(data)
+        import pandas as pd
+
         df = pd.DataFrame(datas)
         df.index = [i for i in range(len(df))]
         return df
 
     def extract_api_from_frontend(self):
         datas = []
-        for root, dirs, files in os.walk(self.module_path, topdown=False):
-            if os.path.join(self.module_path, 'node_modules') in root:
-                continue
-            for file in files:
-                if os.path.splitext(file)[1] in ['.js', '.ts', '.tsx']:
-                    filepath = os.path.join(root, file)
-                    with open(filepath, 'r') as f:
-                        lines = f.readlines()
-                        for idx, line in enumerate(lines):
-                            if 'from' in line or 'import' in line:
-                                continue
-                            apis = self.extract_api_from_line(line)
-                            data = [{'file': os.path.abspath(filepath).replace(self.module_path, ''), 'api': api,
-                                     'line': idx + 1} for api in apis]
-                            datas.extend(data)
+        filepaths = self.inventory.files('.js', '.ts', '.tsx')
+        for filepath, apis in zip(filepaths, iter_map(scan_apis, filepaths, self.jobs)):
+            data = [{'file': os.path.abspath(filepath).replace(self.module_path, ''), 'api': api,
+                     'line': line} for line, api in apis]
+            datas.extend(data)
+        import pandas as pd
+
         df = pd.DataFrame(datas)
         df.index = [i for i in range(len(df))]
         return df
 
 
+class StructureItem():
+    """
+    语法树中一个方法或类的检查所需信息，检查只读这些信息，不再访问astroid节点，语法树可以提前释放
+    """
+    __slots__ = ('qualname', 'kind', 'fromlineno', 'end_lineno', 'col_offset', 'has_doc', 'method_count',
+                 'comment', 'node')
+
+    def __init__(self, qualname, kind, fromlineno, end_lineno, col_offset, has_doc, method_count=0, node=None):
+        # 完整名称 外层类名.方法名
+        self.qualname = qualname
+        # 'function'、'class'或'other'
+        self.kind = kind
+        self.fromlineno = fromlineno
+        self.end_lineno = end_lineno
+        self.col_offset = col_offset
+        self.has_doc = has_doc
+        # 类中直接定义的方法个数
+        self.method_count = method_count
+        # 节点内的第一条#注释，只对没有文档字符串的节点记录
+        self.comment = None
+        # 语法树节点，release_ast后为None
+        self.node = node
+
+    def __repr__(self):
+        return f'StructureItem({self.kind} {self.qualname} {self.fromlineno}-{self.end_lineno})'
+
+
 class SingleFilechecker():
 
-    def __init__(self, filepath, output=None):
+    def __init__(self, filepath, output=None, ast_node=None, tokens=None, profiler=None, keep_ast=False):
+        """
+        :param filepath: py文件路径
+        :param output: 日志路径
+        :param ast_node: 已经解析好的astroid语法树，pylint插件中直接使用pylint解析的结果，不再重复解析
+        :param tokens: 已经tokenize好的结果，用于获取#注释
+        :param profiler: profiling.Profiler，记录解析、注释扫描、各项检查和写日志的耗时、CPU时间和内存
+        :param keep_ast: check默认在检查前释放语法树，之后basic_items、funcs等返回节点的属性抛出AstNodeException，
+                         为True时不释放，check之后仍可使用这些属性
+        """
         if not os.path.exists(filepath):
             raise FilePathException(f'{filepath} 路径不存在')
 
@@ -452,28 +961,47 @@ class SingleFilechecker():
         else:
             self.output = output
 
-        self.pylinter = PyLinter()
-        self.file = FileItem(name=filepath, filepath=filepath, modpath=filepath)
+        self.profiler = profiler
+        self.keep_ast = keep_ast
+        # 语法树是否由这里解析，release_ast时从astroid的缓存中移除
+        self.parsed = ast_node is None
         try:
-            self.ast_node = self.pylinter.get_ast(self.file.filepath, self.file.name)
+            if ast_node is None:
+                with self.profile_stage('parse'):
+                    ast_node = self.parse(filepath)
+            self.ast_node = ast_node
             self.body = self.ast_node.body
-            self.basic_items_lst = []
-            self.basic_items
+            # 所有方法和类的StructureItem，按源码中出现的顺序排列
+            with self.profile_stage('index'):
+                self.index = self.build_index()
         except:
             raise AstNodeException(f'{self.filepath} raise AstNodeException!')
-        self.get_comments()
+        with self.profile_stage('comments'):
+            self.get_comments(tokens)
+        self.findings = []
 
-    def write(self, text):
+    def profile_stage(self, name):
+        return stage(self.profiler, name, os.path.abspath(self.filepath))
+
+    def flush(self):
+        """将缓存的检查结果一次性写入日志"""
+        if len(self.findings) == 0:
+            return
         with open(self.output, 'a') as f:
-            f.write(text + '\n')
+            f.write(''.join(format_ysrd(finding) + '\n' for finding in self.findings))
+        self.findings = []
 
     def get_encoding(self, file):
-        with open(file, 'rb') as f:
-            data = f.read()
-            return chardet.detect(data)['encoding']
+        return detect_encoding(file)
+
+    def require_ast(self):
+        """返回节点的属性在语法树释放后调用时给出明确的错误，而不是返回None或者TypeError"""
+        if self.body is None:
+            raise AstNodeException(f'{self.filepath} 的语法树已经释放(check或release_ast)，需要节点时使用keep_ast=True')
 
     @property
     def body_items(self):
+        self.require_ast()
         return [item for item in self.body]
 
     @property
@@ -482,6 +1010,9 @@ class SingleFilechecker():
         只返回最上一层的方法，不包括类方法和嵌套方法
         :return:
         """
+        from astroid.nodes import FunctionDef
+
+        self.require_ast()
         return [item for item in self.body if isinstance(item, FunctionDef)]
 
     @property
@@ -490,48 +1021,97 @@ class SingleFilechecker():
         只返回最上一层的类，不包括嵌套类
         :return:
         """
+        from astroid.nodes import ClassDef
+
+        self.require_ast()
         return [item for item in self.body if isinstance(item, ClassDef)]
 
     @property
     def imports(self):
+        from astroid.nodes import Import
+
+        self.require_ast()
         return [item for item in self.body if isinstance(item, Import)]
 
     @property
     def import_froms(self):
+        from astroid.nodes import ImportFrom
+
+        self.require_ast()
         return [item for item in self.body if isinstance(item, ImportFrom)]
 
-    @property
-    def basic_items(self):
+    def parse(self, filepath):
+        """用astroid解析文件，与pylint的解析方式一致"""
+        from pylint.typing import FileItem
+
+        self.file = FileItem(name=filepath, filepath=filepath, modpath=filepath)
+        return parse_module(self.file.filepath, self.file.name)
+
+    def structure_item(self, node, qualname):
+        from astroid.nodes import ClassDef, FunctionDef
+
+        if isinstance(node, FunctionDef):
+            kind = 'function'
+        elif isinstance(node, ClassDef):
+            kind = 'class'
+        else:
+            kind = 'other'
+        method_count = len([item for item in node.body if isinstance(item, FunctionDef)]) if kind == 'class' else 0
+        return StructureItem(qualname, kind, node.fromlineno, node.end_lineno, node.col_offset,
+                             getattr(node, 'doc', None) != None, method_count, node)
+
+    def build_index(self):
         """
         由于self.body中只包含了第一层的所有节点，类似结构树，每个节点下可能还存在节点
-        需要用全扫描的方法扫出来，这个方法目前只返回了有name属性的节点，已满足需求
-        后续如需所有节点，可以用该节点的*name*属性拼接成name
-        :return: 返回方法、类、和类中的方法
+        需要用全扫描的方法扫出来，这个方法目前只记录了有name属性的节点，已满足需求
+        用显式的栈按先序遍历，嵌套很深的代码也不会超过递归深度，不修改节点本身，
+        这样在pylint插件中与其他checker共用同一棵语法树时不会互相影响
+        :return: [StructureItem, ...]
         """
-
-        def walk(item):
+        index = []
+        stack = [(item, '') for item in reversed(self.body)]
+        while stack:
+            item, prefix = stack.pop()
             if hasattr(item, 'name'):
-                if hasattr(item, 'parent'):
-                    if item.parent.name != self.file.name:
-                        item.name = item.parent.name + '.' + item.name
-                if item != self:
-                    self.basic_items_lst.append(item)
-            if hasattr(item, 'body'):
-                for i in item.body:
-                    walk(i)
-
-        # 这里只遍历一次，否则name会重复叠加
-        if self.basic_items_lst == []:
-            walk(self)
-        return self.basic_items_lst
+                structure_item = self.structure_item(item, prefix + item.name)
+                index.append(structure_item)
+                prefix = structure_item.qualname + '.'
+            body = getattr(item, 'body', None)
+            if isinstance(body, list):
+                stack.extend((i, prefix) for i in reversed(body))
+        return index
+
+    def release_ast(self):
+        """
+        检查只需要self.index，释放语法树，由这里解析的语法树同时从astroid的缓存中移除，
+        之后basic_items、funcs等返回节点的属性抛出AstNodeException
+        """
+        if self.parsed and self.ast_node is not None:
+            from astroid import MANAGER
+
+            if MANAGER.astroid_cache.get(self.ast_node.name) is self.ast_node:
+                del MANAGER.astroid_cache[self.ast_node.name]
+        self.ast_node = None
+        self.body = None
+        for item in self.index:
+            item.node = None
+
+    @property
+    def basic_items(self):
+        """
+        :return: 返回方法、类、和类中的方法的astroid节点
+        """
+        self.require_ast()
+        return [item.node for item in self.index]
 
     @property
     def all_funcs(self):
         """
         是结构树中所有的方法，包括类中的方法和嵌套方法
-        :return: 返回方法、类、和类中的方法
+        :return:
         """
-        return [item for item in self.basic_items if isinstance(item, FunctionDef)]
+        self.require_ast()
+        return [item.node for item in self.index if item.kind == 'function']
 
     @property
     def all_classes(self):
@@ -539,23 +1119,52 @@ class SingleFilechecker():
         是结构树中所有的类，包括嵌套类
         :return:
         """
-        return [item for item in self.basic_items if isinstance(item, ClassDef)]
+        self.require_ast()
+        return [item.node for item in self.index if item.kind == 'class']
 
-    def get_comments(self):
+    def get_comments(self, tokens=None):
         """
-        doc方法只能获取到3引号的注释，获取不到#类型的注释,所以在这个方法将#注释加到doc里
+        doc方法只能获取到3引号的注释，获取不到#类型的注释,所以在这个方法将#注释记录到StructureItem.comment里
+        整个文件只tokenize一次，建立按行号排序的#注释索引，再用二分查找每个节点行号区间内的第一条注释
+        :param tokens: pylint插件中直接复用pylint tokenize的结果
         :return:
         """
-        for item in self.basic_items:
-            if item.doc != None:
-                continue
+        items = [item for item in self.index if not item.has_doc]
+        if len(items) == 0:
+            return
+        comment_lines = []
+        comments = []
+        fileObj = None
+        if tokens is None:
             fileObj = open(self.filepath, 'r', encoding=self.get_encoding(self.filepath))
-            for toktype, tok, start, end, line in tokenize.generate_tokens(fileObj.readline):
-                line_num = start[0]
-                if item.fromlineno - 1 < line_num < item.end_lineno:
-                    if toktype == tokenize.COMMENT:
-                        item.doc = tok
-                        break
+            tokens = tokenize.generate_tokens(fileObj.readline)
+        try:
+            for toktype, tok, start, end, line in tokens:
+                if toktype == tokenize.COMMENT:
+                    comment_lines.append(start[0])
+                    comments.append(tok)
+        finally:
+            if fileObj is not None:
+                fileObj.close()
+        for item in items:
+            # 区间 fromlineno <= line_num < end_lineno 内的第一条注释
+            idx = bisect.bisect_left(comment_lines, item.fromlineno)
+            if idx < len(comment_lines) and comment_lines[idx] < item.end_lineno:
+                item.comment = comments[idx]
+
+    def has_comments(self, item):
+        return item.has_doc or item.comment != None
+
+    def report(self, code, item, *args):
+        """
+        输出一条YsrdLinter自定义检查的结果，pylint插件中重写该方法，改为交给pylint输出
+        :param code: YSRD_MESSAGES中的代码
+        :param item: 出现问题的方法或者类的StructureItem
+        :param args: 提示信息中的参数
+        """
+        msg, symbol = YSRD_MESSAGES[code]
+        self.findings.append(
+            Finding(self.filepath, item.fromlineno, item.col_offset, code, symbol, f'[{item.qualname}] {msg % args}'))
 
     def check_func_line(self, max_length=80):
         """
@@ -563,42 +1172,47 @@ class SingleFilechecker():
         :param max_length:
         :return:
         """
-        for func in self.all_funcs:
+        for func in self.index:
+            if func.kind != 'function':
+                continue
             length = func.end_lineno - func.fromlineno
             if length > max_length:
-                self.write(
-                    f'{self.filepath}:{func.fromlineno}:FR001:[{func.name}] Function has too many rows ({length}/{max_length}) (function has too many rows)')
+                self.report('FR001', func, length, max_length)
 
     def check_class_def_number(self, max_number=10):
-        for _class in self.all_classes:
-            class_funcs = [item for item in _class.body if isinstance(item, FunctionDef)]
-            number = len(class_funcs)
+        for _class in self.index:
+            if _class.kind != 'class':
+                continue
+            number = _class.method_count
             if number > max_number:
-                self.write(
-                    f'{self.filepath}:{_class.fromlineno}:CF001:[{_class.name}] Class has too many functions ({number}/{max_number}) (class has too many functions)')
+                self.report('CF001', _class, number, max_number)
 
     def check_comments(self, min_length=10):
-        for item in self.basic_items:
-            if isinstance(item, (FunctionDef, ClassDef)):
+        for item in self.index:
+            if item.kind in ('function', 'class'):
                 length = item.end_lineno - item.fromlineno
-                if length > min_length and item.doc == None:
-                    self.write(
-                        f'{self.filepath}:{item.fromlineno}:NC001:[{item.name}] Function or Class has no comments (no comments)')
+                if length > min_length and not self.has_comments(item):
+                    self.report('NC001', item)
 
-    def check(self, if_pylint=True, if_print=True):
+    def check(self, if_pylint=True, if_print=True, if_write=True):
+        # 检查只需要self.index，keep_ast为False时先释放语法树
+        if not self.keep_ast:
+            self.release_ast()
         if if_pylint:
-            p1 = Process(target=pylint_check, kwargs={'input': self.filepath, 'output': self.output})
-            p1.start()
-            p1.join()
-            if p1.exception:
-                exception, traceback = p1.exception
-                p1.terminate()
-                raise exception
-        self.check_func_line()
-        self.check_class_def_number()
-        self.check_comments()
+            with self.profile_stage('pylint'):
+                record = get_pool().apply(pylint_check, self.filepath, self.output, self.profiler is not None)
+            if record is not None:
+                self.profiler.add(record)
+        for check_func in (self.check_func_line, self.check_class_def_number, self.check_comments):
+            with self.profile_stage(check_func.__name__):
+                check_func()
+        if if_write:
+            with self.profile_stage('write'):
+                self.flush()
         if if_print:
             self.print_output()
+        if self.profiler is not None and self.profiler.path is not None:
+            self.profiler.dump()
 
     def print_output(self):
         fileObj = open(self.output, 'r')
@@ -606,6 +1220,59 @@ class SingleFilechecker():
             print(line)
 
 
+class FastFilechecker(SingleFilechecker):
+    """
+    只用标准库的ast和tokenize完成FR001、CF001、NC001三项检查，不导入pylint和astroid，
+    检查结果与SingleFilechecker一致，适合在编辑器中每次修改后运行
+    """
+
+    def __init__(self, filepath, output=None, source=None, profiler=None, keep_ast=False):
+        """
+        :param source: 文件内容，编辑器中还没有保存的内容可以直接传入，为None时读取文件
+        """
+        self.source = source
+        super().__init__(filepath, output=output, profiler=profiler, keep_ast=keep_ast)
+
+    def parse(self, filepath):
+        if self.source is None:
+            with open(filepath, 'r', encoding=detect_encoding(filepath)) as f:
+                self.source = f.read()
+        return ast.parse(self.source, filepath)
+
+    def structure_item(self, node, qualname):
+        functions = (ast.FunctionDef, ast.AsyncFunctionDef)
+        if isinstance(node, functions):
+            kind = 'function'
+        elif isinstance(node, ast.ClassDef):
+            kind = 'class'
+        else:
+            kind = 'other'
+        # 与astroid的fromlineno一致: 有装饰器时从第一个装饰器的行号开始，加上各个装饰器所占的行数
+        decorators = getattr(node, 'decorator_list', [])
+        fromlineno = node.lineno
+        if len(decorators) > 0:
+            fromlineno = decorators[0].lineno + sum(item.end_lineno - item.lineno + 1 for item in decorators)
+        has_doc = kind != 'other' and ast.get_docstring(node, clean=False) is not None
+        method_count = len([item for item in node.body if isinstance(item, functions)]) if kind == 'class' else 0
+        return StructureItem(qualname, kind, fromlineno, node.end_lineno, node.col_offset, has_doc, method_count,
+                             node)
+
+    def get_comments(self, tokens=None):
+        if tokens is None:
+            tokens = tokenize.generate_tokens(io.StringIO(self.source).readline)
+        super().get_comments(tokens)
+
+    def release_ast(self):
+        self.ast_node = None
+        self.body = None
+        self.source = None
+        for item in self.index:
+            item.node = None
+
+    def check(self, if_pylint=False, if_print=True, if_write=True):
+        super().check(if_pylint=if_pylint, if_print=if_print, if_write=if_write)
+
+
 """
 由于使用多进程的原因
 程序需要在